@@ -0,0 +1,275 @@
+import json
+import sys
+import os
+from datetime import datetime, date
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from models import db, User, Recommendation, RecommendationArchive, CohortAggregate
+
+# Upper bound (exclusive) of each age bracket; older users fall into '65+'
+AGE_BRACKETS = [(25, '<25'), (35, '25-34'), (45, '35-44'), (55, '45-54'), (65, '55-64')]
+
+COHORT_DIMENSIONS = ['risk_preference', 'investment_goals', 'age_bracket']
+
+INSTRUMENT_COLUMNS = {
+    'FD': 'sum_fd',
+    'Bank': 'sum_bank',
+    'SIP': 'sum_sip',
+    'Gold': 'sum_gold',
+    'Silver': 'sum_silver'
+}
+
+SUM_COLUMNS = list(INSTRUMENT_COLUMNS.values()) + ['sum_expected_roi', 'sum_investable_amount']
+KEY_COLUMNS = ['day', 'risk_preference', 'investment_goals', 'age_bracket']
+
+CohortKey = Tuple[date, str, str, str]
+
+def age_bracket(age: Optional[int]) -> str:
+    if age is None:
+        return 'unknown'
+    for limit, label in AGE_BRACKETS:
+        if age < limit:
+            return label
+    return '65+'
+
+def cohort_key(risk_preference: Optional[str], investment_goals: Optional[str], age: Optional[int],
+               created_at: datetime) -> CohortKey:
+    return (created_at.date(), risk_preference or 'unknown', investment_goals or 'unknown', age_bracket(age))
+
+def accumulate(aggregates: Dict[CohortKey, Dict[str, float]], key: CohortKey, portfolio: Dict,
+               expected_returns: Dict, investable_amount: Optional[float]):
+    """Add one recommendation to an in-memory {cohort key: sums} map."""
+    entry = aggregates.setdefault(key, dict({'count': 0}, **{column: 0.0 for column in SUM_COLUMNS}))
+    entry['count'] += 1
+    for instrument, column in INSTRUMENT_COLUMNS.items():
+        entry[column] += (portfolio or {}).get(instrument, 0) or 0
+    entry['sum_expected_roi'] += (expected_returns or {}).get('total_expected_roi_percent', 0) or 0
+    entry['sum_investable_amount'] += investable_amount or 0
+
+def _dialect() -> str:
+    return db.session.get_bind().dialect.name
+
+def _upsert(table):
+    """INSERT that adds to the sums of an existing cohort row, in the database's own syntax."""
+    columns = ['count'] + SUM_COLUMNS
+    dialect = _dialect()
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        statement = insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c[name] for name in KEY_COLUMNS],
+            set_={column: table.c[column] + statement.excluded[column] for column in columns}
+        )
+    if dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update(
+            {column: table.c[column] + statement.inserted[column] for column in columns}
+        )
+    raise RuntimeError(f"Cohort aggregates are not supported on '{dialect}'; use SQLite, PostgreSQL or MySQL")
+
+def merge_aggregates(aggregates: Dict[CohortKey, Dict[str, float]], table=None):
+    """Add in-memory sums to the CohortAggregate table (or a copy of it); the caller commits."""
+    if not aggregates:
+        return
+    table = table if table is not None else CohortAggregate.__table__
+
+    # One upsert for all keys: concurrent writers add to the same row instead of racing on insert
+    db.session.execute(_upsert(table), [
+        dict(zip(KEY_COLUMNS, key), **sums) for key, sums in aggregates.items()
+    ])
+
+def record_recommendation(user: User, portfolio: Dict, expected_returns: Dict, created_at: Optional[datetime] = None):
+    """Fold a newly written recommendation into the cohort aggregates."""
+    aggregates = {}
+    key = cohort_key(user.risk_preference, user.investment_goals, user.age, created_at or datetime.utcnow())
+    accumulate(aggregates, key, portfolio, expected_returns, user.investable_amount)
+    merge_aggregates(aggregates)
+
+def _accumulate_live(aggregates, recommendations, profile):
+    for rec in recommendations:
+        user = profile(rec.user_id)
+        if user is None:
+            continue
+        key = cohort_key(user.risk_preference, user.investment_goals, user.age, rec.created_at)
+        accumulate(aggregates, key, json.loads(rec.portfolio_json or '{}'),
+                   json.loads(rec.expected_returns_json or '{}'), user.investable_amount)
+
+def rebuild_aggregates(batch_size: int = 5000) -> int:
+    """Recompute all aggregates from live and archived recommendations.
+
+    Sums are built in a staging table and copied over CohortAggregate in one
+    transaction, so readers see either the old or the new totals. Rows written
+    after the rebuild starts are folded in inside that transaction while it
+    holds the write lock, so they are counted exactly once.
+
+    The result can differ from the incrementally maintained totals: the rebuild
+    files every row under the user's current profile, and rows removed by
+    retention rollups are gone, so their days count fewer recommendations. Run
+    it with compaction paused, since a row archived mid-rebuild may be counted
+    in both passes or in neither.
+    """
+    from retention import load_archive_chain
+
+    staging = CohortAggregate.__table__.to_metadata(db.MetaData(), name='cohort_aggregate_rebuild')
+    # Constraint names share one namespace per schema outside SQLite
+    for constraint in staging.constraints:
+        if isinstance(constraint, db.UniqueConstraint):
+            constraint.name = f"{constraint.name}_rebuild"
+    staging.drop(db.engine, checkfirst=True)
+    staging.create(db.engine)
+
+    users = {}
+    def profile(user_id):
+        if user_id not in users:
+            users[user_id] = db.session.get(User, user_id)
+        return users[user_id]
+
+    # Everything up to this id is rebuilt from a snapshot; later rows are folded in at the swap
+    max_id = db.session.query(db.func.max(Recommendation.id)).scalar() or 0
+
+    total, last_id = 0, 0
+    while last_id < max_id:
+        batch = Recommendation.query.filter(
+            Recommendation.id > last_id, Recommendation.id <= max_id
+        ).order_by(Recommendation.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        aggregates = {}
+        _accumulate_live(aggregates, batch, profile)
+        merge_aggregates(aggregates, staging)
+        db.session.commit()
+
+        total += len(batch)
+        last_id = batch[-1].id
+        users.clear()
+
+    def accumulate_archive(aggregates, user_id, newer):
+        user = profile(user_id)
+        if user is None:
+            return 0
+        count = 0
+        for row, state in load_archive_chain(user_id):
+            if (row.original_id > max_id) == newer:
+                key = cohort_key(user.risk_preference, user.investment_goals, user.age, row.created_at)
+                accumulate(aggregates, key, state.get('p'), state.get('e'), user.investable_amount)
+                count += 1
+        return count
+
+    archived_users = [row[0] for row in db.session.query(RecommendationArchive.user_id).distinct()]
+    for user_id in archived_users:
+        aggregates = {}
+        total += accumulate_archive(aggregates, user_id, newer=False)
+        merge_aggregates(aggregates, staging)
+        db.session.commit()
+        users.clear()
+
+    # Swap: block writers until COMMIT. In SQLite the DELETE takes the database write lock;
+    # elsewhere the table is locked explicitly so concurrent upserts wait
+    if _dialect() == 'postgresql':
+        db.session.execute(db.text('LOCK TABLE cohort_aggregate IN EXCLUSIVE MODE'))
+    elif _dialect() in ('mysql', 'mariadb'):
+        db.session.execute(db.select(CohortAggregate.id).with_for_update())
+    db.session.execute(db.delete(CohortAggregate))
+
+    aggregates = {}
+    newer = Recommendation.query.filter(Recommendation.id > max_id).all()
+    _accumulate_live(aggregates, newer, profile)
+    total += len(newer)
+    newer_archived = db.session.query(RecommendationArchive.user_id).filter(
+        RecommendationArchive.original_id > max_id
+    ).distinct()
+    for (user_id,) in newer_archived:
+        total += accumulate_archive(aggregates, user_id, newer=True)
+    merge_aggregates(aggregates, staging)
+
+    columns = KEY_COLUMNS + ['count'] + SUM_COLUMNS
+    db.session.execute(db.insert(CohortAggregate.__table__).from_select(
+        columns, db.select(*[staging.c[column] for column in columns])
+    ))
+    db.session.commit()
+
+    staging.drop(db.engine)
+    return total
+
+def _bucket_expression(bucket: str):
+    """First day of the bucket containing CohortAggregate.day."""
+    if bucket == 'day':
+        return CohortAggregate.day
+    if bucket not in ('week', 'month', 'year'):
+        raise ValueError(f"Unknown bucket '{bucket}'")
+
+    day = CohortAggregate.day
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        if bucket == 'week':
+            # Monday of the week
+            return db.func.date(day, 'weekday 0', '-6 days')
+        return db.func.strftime('%Y-%m-01' if bucket == 'month' else '%Y-01-01', day)
+    if dialect == 'postgresql':
+        return db.cast(db.func.date_trunc(bucket, day), db.Date)
+    if dialect in ('mysql', 'mariadb'):
+        if bucket == 'week':
+            return db.func.subdate(day, db.func.weekday(day))
+        return db.func.date_format(day, '%Y-%m-01' if bucket == 'month' else '%Y-01-01')
+    raise RuntimeError(f"Cohort buckets are not supported on '{dialect}'")
+
+def query_cohorts(dimension: str, bucket: Optional[str] = None, start: Optional[date] = None,
+                  end: Optional[date] = None, filters: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """Average allocation, expected ROI and amount per cohort and time bucket."""
+    if dimension not in COHORT_DIMENSIONS:
+        raise ValueError(f"Unknown dimension '{dimension}'")
+
+    cohort_column = getattr(CohortAggregate, dimension)
+    columns = [cohort_column, db.func.sum(CohortAggregate.count)]
+    columns += [db.func.sum(getattr(CohortAggregate, column)) for column in SUM_COLUMNS]
+    group_by = [cohort_column]
+
+    if bucket:
+        bucket_column = _bucket_expression(bucket)
+        columns.insert(1, bucket_column)
+        group_by.append(bucket_column)
+
+    query = db.session.query(*columns)
+    if start:
+        query = query.filter(CohortAggregate.day >= start)
+    if end:
+        query = query.filter(CohortAggregate.day <= end)
+    for name, value in (filters or {}).items():
+        if name not in COHORT_DIMENSIONS:
+            raise ValueError(f"Unknown filter '{name}'")
+        query = query.filter(getattr(CohortAggregate, name) == value)
+
+    results = []
+    for row in query.group_by(*group_by).order_by(*group_by).all():
+        row = list(row)
+        cohort = row.pop(0)
+        bucket_value = row.pop(0) if bucket else None
+        count, sums = row[0], dict(zip(SUM_COLUMNS, row[1:]))
+
+        results.append({
+            'cohort': cohort,
+            'bucket': bucket_value.isoformat() if isinstance(bucket_value, date) else bucket_value,
+            'count': count,
+            'average_allocation': {
+                instrument: round(sums[column] / count, 2) for instrument, column in INSTRUMENT_COLUMNS.items()
+            },
+            'average_expected_roi_percent': sums['sum_expected_roi'] / count,
+            'average_investable_amount': sums['sum_investable_amount'] / count
+        })
+    return results
+
+if __name__ == "__main__":
+    # Add the current directory to Python path
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import create_app
+
+    app = create_app({'WARMUP': False})
+    with app.app_context():
+        db.create_all()
+        total = rebuild_aggregates()
+
+    print(f"Rebuilt cohort aggregates from {total:,} recommendations")
@@ -1,19 +1,51 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify
 from flask_cors import CORS
-from models import db, User, Recommendation
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import db, User, Recommendation, HistoricalPrice, RetentionPolicy, ensure_schema
 from utils import fetch_metal_price, recommend_allocation
+from retention import load_archive_page, count_archive, get_policy, start_compaction_thread
+from ratelimit import rate_limit
+from config import load_config
+from warmup import run_warmup
+from analytics import record_recommendation, query_cohorts, COHORT_DIMENSIONS
+from sensitivity import rate_sensitivity, parse_inputs
 import json
 import os
-from datetime import datetime
+from datetime import datetime, date
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-CORS(app)
+api = Blueprint('api', __name__)
 
-db.init_app(app)
+def create_app(config=None):
+    """Build the Flask app; settings come from the environment, then `config`."""
+    app = Flask(__name__)
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
+    
+    # Only trust X-Forwarded-For when a proxy is known to set it
+    if app.config['TRUSTED_PROXIES'] > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+    
+    CORS(app, origins=app.config['CORS_ORIGINS'])
+    db.init_app(app)
+    app.register_blueprint(api)
+    
+    # Tables must exist before warm-up reads from them
+    if app.config['CREATE_SCHEMA']:
+        with app.app_context():
+            ensure_schema()
+    
+    # Load caches before the worker accepts traffic
+    if app.config['WARMUP']:
+        run_warmup(app)
+    
+    # Background history compaction, one thread per worker process
+    if app.config['RETENTION_INTERVAL'] > 0:
+        start_compaction_thread(app, app.config['RETENTION_INTERVAL'])
+    
+    return app
 
-@app.route('/api/user/<int:user_id>', methods=['GET'])
+@api.route('/api/user/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     try:
         user = User.query.get_or_404(user_id)
@@ -36,7 +68,7 @@ def get_user(user_id):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 400
 
-@app.route('/api/user', methods=['POST'])
+@api.route('/api/user', methods=['POST'])
 def create_user():
     try:
         data = request.get_json()
@@ -73,7 +105,7 @@ def create_user():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 400
 
-@app.route('/api/user/<int:user_id>', methods=['PUT'])
+@api.route('/api/user/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
     try:
         user = User.query.get_or_404(user_id)
@@ -115,13 +147,14 @@ def update_user(user_id):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 400
 
-@app.route('/api/recommendation/<int:user_id>')
+@api.route('/api/recommendation/<int:user_id>')
+@rate_limit(rate=1, capacity=10)
 def get_recommendation(user_id):
     try:
         user = User.query.get_or_404(user_id)
         lat = request.args.get('lat', type=float)
         lon = request.args.get('lon', type=float)
-        country = request.args.get('country', 'india')
+        country = request.args.get('country')
         
         # Fetch current metal prices
         gold_price = fetch_metal_price('gold', country=country, lat=lat, lon=lon)
@@ -153,6 +186,7 @@ def get_recommendation(user_id):
         )
         
         db.session.add(recommendation)
+        record_recommendation(user, recommendation_data['portfolio'], recommendation_data['expected_returns'])
         db.session.commit()
         
         return jsonify({
@@ -166,13 +200,14 @@ def get_recommendation(user_id):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/api/market')
+@api.route('/api/market')
+@rate_limit(rate=2, capacity=20)
 def get_market_price():
     try:
         asset = request.args.get('asset', 'gold')
         lat = request.args.get('lat', type=float)
         lon = request.args.get('lon', type=float)
-        country = request.args.get('country', 'india')
+        country = request.args.get('country')
         
         price_data = fetch_metal_price(asset, country=country, lat=lat, lon=lon)
         return jsonify(price_data)
@@ -180,7 +215,7 @@ def get_market_price():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/api/portfolio/operation', methods=['POST'])
+@api.route('/api/portfolio/operation', methods=['POST'])
 def portfolio_operation():
     try:
         data = request.get_json()
@@ -209,6 +244,9 @@ def portfolio_operation():
         )
         
         db.session.add(new_recommendation)
+        user = db.session.get(User, user_id)
+        if user:
+            record_recommendation(user, portfolio, expected_returns)
         db.session.commit()
         
         return jsonify({
@@ -225,10 +263,17 @@ def portfolio_operation():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/api/user/<int:user_id>/history')
+@api.route('/api/user/<int:user_id>/history')
 def get_user_history(user_id):
     try:
-        recommendations = Recommendation.query.filter_by(user_id=user_id).order_by(Recommendation.created_at.desc()).all()
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        # Live rows come first (newest), then the archive
+        live_count = Recommendation.query.filter_by(user_id=user_id).count()
+        recommendations = Recommendation.query.filter_by(user_id=user_id).order_by(
+            Recommendation.created_at.desc()
+        ).offset(offset).limit(limit).all()
         
         history = []
         for rec in recommendations:
@@ -239,15 +284,143 @@ def get_user_history(user_id):
                 'created_at': rec.created_at.isoformat()
             })
         
+        # Older entries live in the archive as deltas against the previous one
+        remaining = limit - len(history)
+        if remaining > 0:
+            for row, state in load_archive_page(user_id, max(offset - live_count, 0), remaining):
+                history.append({
+                    'id': row.original_id,
+                    'portfolio': state.get('p'),
+                    'expected_returns': state.get('e'),
+                    'created_at': row.created_at.isoformat(),
+                    'archived': True
+                })
+        
+        total = live_count + count_archive(user_id)
+        
+        return jsonify({
+            'status': 'ok',
+            'history': history,
+            'total': total,
+            'next_offset': offset + len(history) if offset + len(history) < total else None
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def _non_negative_int_or_none(data, key):
+    value = data[key]
+    if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+        raise ValueError(f"{key} must be a non-negative integer or null")
+    return value
+
+@api.route('/api/user/<int:user_id>/retention', methods=['GET', 'PUT'])
+def user_retention(user_id):
+    try:
+        User.query.get_or_404(user_id)
+        
+        if request.method == 'PUT':
+            data = request.get_json()
+            if not isinstance(data, dict):
+                raise ValueError("Request body must be a JSON object")
+            policy = db.session.get(RetentionPolicy, user_id) or RetentionPolicy(user_id=user_id)
+            
+            if 'keep_last' in data:
+                policy.keep_last = _non_negative_int_or_none(data, 'keep_last')
+            if 'rollup_after_days' in data:
+                policy.rollup_after_days = _non_negative_int_or_none(data, 'rollup_after_days')
+            
+            db.session.add(policy)
+            db.session.commit()
+        
+        keep_last, rollup_after_days = get_policy(user_id)
+        
         return jsonify({
             'status': 'ok',
-            'history': history
+            'retention': {
+                'keep_last': keep_last,
+                'rollup_after_days': rollup_after_days
+            }
         })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+@api.route('/api/sensitivity', methods=['POST'])
+@rate_limit(rate=2, capacity=20)
+def get_sensitivity():
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            raise ValueError("Request body must be a JSON object")
+        
+        # Profile from a stored user or from the request; nothing is written
+        if 'user_id' in data:
+            user = User.query.get_or_404(data['user_id'])
+            profile = {
+                'risk_preference': user.risk_preference,
+                'selected_instruments': json.loads(user.selected_instruments),
+                'investable_amount': user.investable_amount
+            }
+            rates = json.loads(user.rates_json)
+        else:
+            profile = data.get('profile') or {}
+            if not isinstance(profile, dict):
+                raise ValueError("profile must be an object")
+            rates = profile.get('rates') or {}
+        if not isinstance(rates, dict) or not isinstance(data.get('rates') or {}, dict):
+            raise ValueError("rates must be an object")
+        rates = dict(rates, **(data.get('rates') or {}))
+        
+        # Reject bad input before spending upstream budget on prices
+        profile, rates, prices, axes, location = parse_inputs(
+            profile, rates, data.get('prices') or {}, data.get('axes', []),
+            {key: data.get(key) for key in ('country', 'lat', 'lon')}
+        )
+        
+        for metal in ['gold', 'silver']:
+            if metal not in prices:
+                prices[metal] = fetch_metal_price(metal, **location)['price']
+        
+        result = rate_sensitivity(profile, rates, prices, axes)
+        
+        return jsonify(dict(result, status='ok', prices=prices))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def _parse_date(args, key):
+    value = args.get(key)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a date in YYYY-MM-DD format")
+
+@api.route('/api/analytics/cohorts')
+def get_cohort_analytics():
+    try:
+        dimension = request.args.get('dimension', 'risk_preference')
+        bucket = request.args.get('bucket')  # day / week / month / year; omitted = whole range
+        start = _parse_date(request.args, 'start')
+        end = _parse_date(request.args, 'end')
+        filters = {name: request.args[name] for name in COHORT_DIMENSIONS if name in request.args}
         
+        cohorts = query_cohorts(dimension, bucket=bucket, start=start, end=end, filters=filters)
+        
+        return jsonify({
+            'status': 'ok',
+            'dimension': dimension,
+            'bucket': bucket,
+            'cohorts': cohorts
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/api/historical/<asset>')
+@api.route('/api/historical/<asset>')
 def get_historical_prices(asset):
     try:
         days = request.args.get('days', 30, type=int)
@@ -275,7 +448,7 @@ def get_historical_prices(asset):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/api/health')
+@api.route('/api/health')
 def health_check():
     """Health check endpoint to verify API is running."""
     return jsonify({
@@ -285,6 +458,6 @@ def health_check():
     })
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
+    # The debug reloader runs this block in two processes; only the child serves
+    app = create_app(None if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' else {'RETENTION_INTERVAL': 0})
     app.run(debug=True, port=5000)
\ No newline at end of file
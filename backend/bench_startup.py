@@ -0,0 +1,58 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a fresh interpreter so module import cost is measured every time
+PROBE = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+client.get('/api/health')
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'total': served - started
+}))
+"""
+
+def measure(runs: int, warmup: bool):
+    samples = []
+    # Probes create the schema on start-up, so keep them away from the real database
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, WARMUP='1' if warmup else '0',
+                   DATABASE_URL=f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env,
+                capture_output=True, text=True, check=True
+            ).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+    return samples
+
+def report(label: str, samples):
+    print(f"{label} ({len(samples)} runs)")
+    for phase in ['import', 'create_app', 'first_request', 'total']:
+        values = sorted(sample[phase] * 1000 for sample in samples)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"  {phase:<14} median {statistics.median(values):8.1f} ms   p95 {p95:8.1f} ms")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure worker start-up time.')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    report('Without warm-up', measure(args.runs, warmup=False))
+    report('With warm-up', measure(args.runs, warmup=True))
@@ -0,0 +1,24 @@
+import os
+from typing import Dict, Any
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def load_config() -> Dict[str, Any]:
+    """Read application settings from the environment."""
+    return {
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL', 'sqlite:///database.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'CORS_ORIGINS': [origin.strip() for origin in os.environ.get('CORS_ORIGINS', '*').split(',') if origin.strip()],
+        'RETENTION_KEEP_LAST': int(os.environ.get('RETENTION_KEEP_LAST', 20)),
+        'RETENTION_ROLLUP_AFTER_DAYS': int(os.environ.get('RETENTION_ROLLUP_AFTER_DAYS', 30)),
+        'RETENTION_INTERVAL': float(os.environ.get('RETENTION_INTERVAL', 0)),  # seconds; 0 disables, or run retention.py from cron
+        'TRUSTED_PROXIES': int(os.environ.get('TRUSTED_PROXIES', 0)),  # proxies in front of the app; 0 trusts none
+        'CREATE_SCHEMA': _env_bool('CREATE_SCHEMA', True),   # create missing tables in create_app
+        'WARMUP': _env_bool('WARMUP', True),                 # run warm-up hooks in create_app
+        'WARMUP_PRICES': _env_bool('WARMUP_PRICES', False),  # also prefetch live prices (spends upstream budget)
+        'WARMUP_HISTORY_DAYS': int(os.environ.get('WARMUP_HISTORY_DAYS', 90))
+    }
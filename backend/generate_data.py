@@ -0,0 +1,241 @@
+import json
+import sys
+import os
+import math
+import time
+import random
+from datetime import datetime, timedelta, date
+from typing import Dict, Any, List, Optional
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import db, User, Recommendation, HistoricalPrice
+from analytics import cohort_key, accumulate, merge_aggregates
+from utils import compute_allocation, instrument_return
+
+# Starting price per gram and daily drift/volatility for the random walk
+ASSET_PARAMS = {
+    'gold': {'start': 6200.0, 'drift': 0.0003, 'volatility': 0.010},
+    'silver': {'start': 74.0, 'drift': 0.0002, 'volatility': 0.016}
+}
+EXTRA_ASSET_PARAMS = {'start': 100.0, 'drift': 0.0002, 'volatility': 0.020}
+
+# Probability of (low, medium, high) risk preference by age bracket
+RISK_BY_AGE = [
+    (30, (0.20, 0.45, 0.35)),
+    (50, (0.30, 0.45, 0.25)),
+    (200, (0.55, 0.35, 0.10))
+]
+
+def _rng(seed: int, *parts) -> random.Random:
+    """Independent stream per entity; string seeds hash the same in every process."""
+    return random.Random(':'.join(str(part) for part in (seed,) + parts))
+
+def _progress(label: str, done: int, total: int, started: float):
+    rate = done / max(time.time() - started, 1e-9)
+    sys.stderr.write(f"\r{label}: {done:,}/{total:,} ({rate:,.0f}/s)")
+    if done >= total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+def price_series(asset: str, start: date, end: date, seed: int) -> Dict[date, float]:
+    """Daily geometric random walk for an asset, identical for the same seed."""
+    params = ASSET_PARAMS.get(asset, EXTRA_ASSET_PARAMS)
+    rng = _rng(seed, 'price', asset)
+    sigma = params['volatility']
+    mu = params['drift'] - sigma ** 2 / 2
+
+    series = {}
+    price = params['start']
+    for offset in range((end - start).days + 1):
+        series[start + timedelta(days=offset)] = round(price, 2)
+        price *= math.exp(rng.gauss(mu, sigma))
+    return series
+
+def generate_user(user_id: int, seed: int, end: datetime, years: float) -> Dict[str, Any]:
+    """Profile for one user, drawn from age-dependent distributions."""
+    rng = _rng(seed, 'user', user_id)
+
+    age = int(min(75, max(18, rng.gauss(36, 11))))
+    income = math.exp(rng.gauss(13.1, 0.6)) * min(2.0, max(0.7, 1 + 0.02 * (age - 25)))
+
+    low, medium, _ = next(weights for limit, weights in RISK_BY_AGE if age < limit)
+    roll = rng.random()
+    risk_preference = 'low' if roll < low else 'medium' if roll < low + medium else 'high'
+
+    selected = [name for name, p in [
+        ('FD', 0.7), ('Bank', 0.6), ('SIP', 0.75 if risk_preference == 'high' else 0.55)
+    ] if rng.random() < p] or [rng.choice(['FD', 'Bank', 'SIP'])]
+
+    return {
+        'id': user_id,
+        'name': f"Load User {user_id}",
+        'age': age,
+        'income': round(income, -3),
+        'risk_preference': risk_preference,
+        'investment_goals': 'long-term' if rng.random() < (0.7 if age < 45 else 0.45) else 'short-term',
+        'selected_instruments': json.dumps(selected),
+        'rates_json': json.dumps({
+            'FD': round(rng.gauss(6.5, 0.4), 2),
+            'Bank': round(rng.gauss(3.5, 0.3), 2),
+            'SIP': round(rng.gauss(12.0, 2.0), 2)
+        }),
+        'investable_amount': max(1000.0, round(income * rng.uniform(0.05, 0.4), -3)),
+        'created_at': end - timedelta(days=rng.uniform(0, years * 365))
+    }
+
+def _expected_returns(allocation: Dict[str, float], investable_amount: float, rates: Dict,
+                      prices: Dict[str, float], baselines: Dict[str, float], baseline_date: date) -> Dict[str, Any]:
+    """Expected returns in the same shape recommend_allocation produces."""
+    expected_returns = {}
+    total_portfolio_value = 0
+
+    for instrument, allocation_percent in allocation.items():
+        amount = investable_amount * (allocation_percent / 100)
+        if allocation_percent <= 0:
+            continue
+
+        if instrument in ['Gold', 'Silver']:
+            expected_returns[instrument] = dict(
+                instrument_return(instrument, amount, price=prices[instrument.lower()],
+                                  baseline_price=baselines[instrument.lower()]),
+                source='synthetic',
+                historical_date=baseline_date.isoformat()
+            )
+        else:
+            expected_returns[instrument] = instrument_return(instrument, amount, rate=rates[instrument])
+        total_portfolio_value += expected_returns[instrument]['projected_value']
+
+    expected_returns['total_expected_roi_percent'] = ((total_portfolio_value - investable_amount) / investable_amount) * 100
+    return expected_returns
+
+def generate_recommendations(user: Dict[str, Any], seed: int, end: datetime, per_user: float,
+                             series: Dict[str, Dict[date, float]]) -> List[Dict[str, Any]]:
+    """History of recommendations for one user between sign-up and `end`."""
+    rng = _rng(seed, 'recommendations', user['id'])
+    count = int(rng.expovariate(1 / per_user)) if per_user > 0 else 0
+
+    allocation = compute_allocation(user['risk_preference'], json.loads(user['selected_instruments']))
+    rates = json.loads(user['rates_json'])
+    span = (end - user['created_at']).total_seconds()
+
+    rows = []
+    for created_at in sorted(user['created_at'] + timedelta(seconds=rng.uniform(0, span)) for _ in range(count)):
+        day = created_at.date()
+        baseline_date = day - timedelta(days=30)
+        prices = {asset: series[asset][day] for asset in ('gold', 'silver')}
+        baselines = {asset: series[asset].get(baseline_date, prices[asset]) for asset in ('gold', 'silver')}
+
+        rows.append({
+            'user_id': user['id'],
+            'portfolio_json': json.dumps(allocation),
+            'expected_returns_json': json.dumps(
+                _expected_returns(allocation, user['investable_amount'], rates, prices, baselines, baseline_date)
+            ),
+            'source_prices_json': json.dumps({
+                asset: {'asset': asset, 'price': prices[asset], 'unit': 'g', 'source': 'synthetic',
+                        'timestamp': created_at.isoformat(), 'location': 'india'}
+                for asset in prices
+            }),
+            'created_at': created_at
+        })
+    return rows
+
+def _insert(model, rows: List[Dict[str, Any]]):
+    if rows:
+        db.session.execute(db.insert(model), rows)
+        db.session.commit()
+
+def generate_data(users: int = 1000, years: float = 2, recs_per_user: float = 5, extra_assets: int = 0,
+                  seed: int = 42, chunk_size: int = 5000, drop: bool = False,
+                  end_date: Optional[date] = None) -> Dict[str, int]:
+    """Bulk-insert a deterministic synthetic dataset; must run inside an app context."""
+    end_date = end_date or datetime.utcnow().date()
+    end = datetime.combine(end_date, datetime.min.time())
+    start_date = end_date - timedelta(days=int(years * 365) + 31)
+
+    if drop:
+        db.drop_all()
+    db.create_all()
+
+    # Prices
+    assets = list(ASSET_PARAMS) + [f"asset_{index}" for index in range(1, extra_assets + 1)]
+    series = {asset: price_series(asset, start_date, end_date, seed) for asset in assets}
+    total_prices = sum(len(points) for points in series.values())
+    started, done, buffer = time.time(), 0, []
+
+    for asset in assets:
+        existing = {row[0] for row in db.session.query(HistoricalPrice.date).filter(
+            HistoricalPrice.asset == asset, HistoricalPrice.date >= start_date
+        )}
+        for day, price in series[asset].items():
+            done += 1
+            if day not in existing:
+                buffer.append({'asset': asset, 'date': day, 'price': price, 'unit': 'g',
+                               'source': 'synthetic', 'created_at': end})
+            if len(buffer) >= chunk_size:
+                _insert(HistoricalPrice, buffer)
+                buffer = []
+                _progress('Prices', done, total_prices, started)
+    _insert(HistoricalPrice, buffer)
+    _progress('Prices', total_prices, total_prices, started)
+
+    # Users and their recommendation history, committed in chunks
+    first_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    started, rec_count, rec_buffer = time.time(), 0, []
+
+    for chunk_start in range(first_id, first_id + users, chunk_size):
+        chunk_ids = range(chunk_start, min(chunk_start + chunk_size, first_id + users))
+        user_rows = [generate_user(user_id, seed, end, years) for user_id in chunk_ids]
+        _insert(User, user_rows)
+
+        # Cohort aggregates are maintained here since bulk inserts bypass the app
+        aggregates = {}
+        for user in user_rows:
+            recommendations = generate_recommendations(user, seed, end, recs_per_user, series)
+            for rec in recommendations:
+                key = cohort_key(user['risk_preference'], user['investment_goals'], user['age'], rec['created_at'])
+                accumulate(aggregates, key, json.loads(rec['portfolio_json']),
+                           json.loads(rec['expected_returns_json']), user['investable_amount'])
+
+            rec_buffer.extend(recommendations)
+            if len(rec_buffer) >= chunk_size:
+                rec_count += len(rec_buffer)
+                _insert(Recommendation, rec_buffer)
+                rec_buffer = []
+        merge_aggregates(aggregates)
+        db.session.commit()
+
+        _progress('Users', chunk_ids[-1] - first_id + 1, users, started)
+
+    rec_count += len(rec_buffer)
+    _insert(Recommendation, rec_buffer)
+
+    return {'users': users, 'recommendations': rec_count, 'prices': total_prices, 'assets': len(assets)}
+
+if __name__ == "__main__":
+    import argparse
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic dataset for load testing.')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--years', type=float, default=2, help='history length for users, recommendations and prices')
+    parser.add_argument('--recs-per-user', type=float, default=5, help='mean recommendations per user')
+    parser.add_argument('--extra-assets', type=int, default=0, help='additional random-walk price series')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=5000, help='rows per bulk insert')
+    parser.add_argument('--end-date', type=date.fromisoformat, default=None, help='last day of history (YYYY-MM-DD)')
+    parser.add_argument('--drop', action='store_true', help='drop and recreate all tables first')
+    args = parser.parse_args()
+
+    app = create_app({'WARMUP': False})
+    with app.app_context():
+        totals = generate_data(
+            users=args.users, years=args.years, recs_per_user=args.recs_per_user,
+            extra_assets=args.extra_assets, seed=args.seed, chunk_size=args.chunk_size,
+            drop=args.drop, end_date=args.end_date
+        )
+
+    print(f"✅ Generated {totals['users']:,} users, {totals['recommendations']:,} recommendations "
+          f"and {totals['prices']:,} price points across {totals['assets']} assets")
@@ -0,0 +1,94 @@
+import json
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+DEFAULT_REGION = 'india'   # used when the request carries no location hints
+UNKNOWN_REGION = 'global'  # hints were given but match no bundled country
+MAX_CITY_DISTANCE_KM = 400  # beyond this, fall back to country bounding boxes
+
+LOCATIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'locations.json')
+
+def _normalize_text(value: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("U.S.A." -> "usa")."""
+    value = re.sub(r'[.\']', '', value.lower())
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', value).split())
+
+@lru_cache(maxsize=1)
+def load_locations() -> Dict[str, Any]:
+    """Load the bundled country and city table and build the lookup index."""
+    with open(LOCATIONS_FILE) as f:
+        data = json.load(f)
+
+    aliases = {}
+    for code, country in data['countries'].items():
+        for name in [code, country['name']] + country['aliases']:
+            aliases.setdefault(_normalize_text(name), code)
+
+    return {
+        'countries': data['countries'],
+        'cities': data['cities'],
+        'aliases': aliases,
+        'regions': {country['region'] for country in data['countries'].values()}
+    }
+
+def normalize_country(value: Optional[str]) -> Optional[str]:
+    """Map a country name, alias, ISO 3166 alpha-2 or alpha-3 code to its alpha-2 code."""
+    if not value:
+        return None
+    return load_locations()['aliases'].get(_normalize_text(value))
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+def country_from_coordinates(lat: Optional[float], lon: Optional[float]) -> Optional[str]:
+    """Resolve coordinates to an alpha-2 code using the nearest bundled city, then bounding boxes."""
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+
+    locations = load_locations()
+
+    nearest_code, nearest_distance = None, MAX_CITY_DISTANCE_KM
+    for city_lat, city_lon, code in locations['cities']:
+        # Cheap rejection before the trigonometry; one degree of latitude is ~111 km
+        if abs(city_lat - lat) * 111 > nearest_distance:
+            continue
+        distance = _haversine_km(lat, lon, city_lat, city_lon)
+        if distance < nearest_distance:
+            nearest_code, nearest_distance = code, distance
+
+    if nearest_code:
+        return nearest_code
+
+    # Remote points: the smallest bounding box that contains them
+    best_code, best_area = None, None
+    for code, country in locations['countries'].items():
+        min_lat, max_lat, min_lon, max_lon = country['box']
+        if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+            area = (max_lat - min_lat) * (max_lon - min_lon)
+            if best_area is None or area < best_area:
+                best_code, best_area = code, area
+    return best_code
+
+def resolve_region(country: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> str:
+    """Resolve request location hints to one of the canonical price regions.
+
+    Without hints this is DEFAULT_REGION; hints that cannot be resolved give
+    UNKNOWN_REGION rather than silently pricing another country.
+    """
+    locations = load_locations()
+
+    # Region names such as "europe" are accepted as-is
+    if country and _normalize_text(country) in locations['regions']:
+        return _normalize_text(country)
+
+    code = normalize_country(country) or country_from_coordinates(lat, lon)
+    if code:
+        return locations['countries'][code]['region']
+    if country or (lat is not None and lon is not None):
+        return UNKNOWN_REGION
+    return DEFAULT_REGION
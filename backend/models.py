@@ -26,10 +26,57 @@ class HistoricalPrice(db.Model):
     
     # Create unique constraint on asset and date
     __table_args__ = (db.UniqueConstraint('asset', 'date', name='unique_asset_date'),)
+
 class Recommendation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     portfolio_json = db.Column(db.Text)         # {"FD":40,"Bank":20,"SIP":20,"Gold":10,"Silver":10}
     expected_returns_json = db.Column(db.Text)  # expected returns by instrument and total
     source_prices_json = db.Column(db.Text)     # {"gold": {"price":..., "source":"duckduckgo"}, "silver": {...}}
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # History and compaction both walk a user's rows in time order
+    __table_args__ = (db.Index('ix_recommendation_user_created', 'user_id', 'created_at'),)
+
+class RecommendationArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    original_id = db.Column(db.Integer, nullable=False)  # id of the Recommendation row it replaced
+    is_snapshot = db.Column(db.Boolean, default=False)   # full documents instead of a delta
+    payload_json = db.Column(db.Text, nullable=False)    # {"p":...,"e":...,"s":...} or merge patch vs previous entry
+    created_at = db.Column(db.DateTime, nullable=False)  # created_at of the original recommendation
+
+    __table_args__ = (db.Index('ix_recommendation_archive_user_created', 'user_id', 'created_at'),)
+
+class RetentionPolicy(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    keep_last = db.Column(db.Integer)           # recommendations kept in full; NULL = app default
+    rollup_after_days = db.Column(db.Integer)   # older entries collapse to one per day; NULL = app default
+    rolled_up_until = db.Column(db.DateTime)    # compaction watermark: archive rolled up through this time
+
+class CohortAggregate(db.Model):
+    # One row per cohort and day, updated as recommendations are written
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    risk_preference = db.Column(db.String, nullable=False)
+    investment_goals = db.Column(db.String, nullable=False)
+    age_bracket = db.Column(db.String, nullable=False)          # e.g. '25-34', '65+', 'unknown'
+    count = db.Column(db.Integer, nullable=False, default=0)
+    sum_fd = db.Column(db.Float, nullable=False, default=0)      # sums of allocation percentages
+    sum_bank = db.Column(db.Float, nullable=False, default=0)
+    sum_sip = db.Column(db.Float, nullable=False, default=0)
+    sum_gold = db.Column(db.Float, nullable=False, default=0)
+    sum_silver = db.Column(db.Float, nullable=False, default=0)
+    sum_expected_roi = db.Column(db.Float, nullable=False, default=0)
+    sum_investable_amount = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'risk_preference', 'investment_goals', 'age_bracket', name='unique_cohort_day'),
+    )
+
+def ensure_schema():
+    """Create missing tables, and the indexes create_all skips on tables that already exist."""
+    db.create_all()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
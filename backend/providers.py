@@ -0,0 +1,267 @@
+import json
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ratelimit import take_token
+
+HEDGE_DELAY = 0.3        # seconds before the next provider is asked as well
+FETCH_DEADLINE = 10.0    # overall limit for one price lookup
+FAILURE_THRESHOLD = 3    # consecutive failures before a provider is benched
+FAILURE_COOLDOWN = 60.0  # seconds a benched provider is skipped
+HEDGED_TIMEOUT = 3.0     # read timeout for providers launched as hedges
+
+# Each lookup can hold one worker per provider until its timeout expires
+PROVIDER_WORKERS = int(os.environ.get('PRICE_PROVIDER_WORKERS', 8))
+
+# Global budget for upstream price lookups, shared by every route and client
+UPSTREAM_BUDGET_PER_MINUTE = 30
+UPSTREAM_BURST = 10
+
+Validator = Callable[[float], bool]
+
+_session = None
+_session_lock = threading.Lock()
+_call = threading.local()  # per-call limits set by _run on the worker thread
+
+def get_session():
+    """Return the shared HTTP session, importing `requests` on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                _session = requests.Session()
+    return _session
+
+class PriceProvider:
+    """A source of spot prices. Subclasses implement `fetch`."""
+
+    name = 'provider'
+    upstream = False  # network providers draw from the upstream budget
+    timeout = 5.0
+
+    def __init__(self):
+        self.latency = None  # EWMA of successful lookups, seconds
+        self.failures = 0
+        self.benched_until = 0.0
+        self._lock = threading.Lock()
+
+    def fetch(self, asset: str, region: str, is_valid: Validator) -> Optional[float]:
+        """Return a price per gram for `asset` in `region`, or None."""
+        raise NotImplementedError
+
+    def request_timeout(self) -> float:
+        """Timeout for the current call: the provider's own, capped by the lookup that started it."""
+        return min(self.timeout, getattr(_call, 'timeout', self.timeout))
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.benched_until
+
+    def record(self, ok: bool, elapsed: float):
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+            else:
+                self.failures += 1
+                if self.failures >= FAILURE_THRESHOLD:
+                    self.benched_until = time.monotonic() + FAILURE_COOLDOWN
+                    self.failures = 0
+
+def _numbers(text: str) -> List[float]:
+    values = []
+    for match in re.findall(r'[\d,]+\.?\d*', text):
+        try:
+            values.append(float(match.replace(',', '')))
+        except ValueError:
+            continue
+    return values
+
+class DuckDuckGoProvider(PriceProvider):
+    """DuckDuckGo Instant Answer API, parsed from Answer or RelatedTopics."""
+
+    name = 'duckduckgo'
+    upstream = True
+    timeout = 10.0
+
+    def fetch(self, asset: str, region: str, is_valid: Validator) -> Optional[float]:
+        params = {
+            'q': f"{asset} price {region}",
+            'format': 'json',
+            'no_html': '1',
+            'skip_disambig': '1'
+        }
+        response = get_session().get("https://api.duckduckgo.com", params=params, timeout=self.request_timeout())
+        response.raise_for_status()
+        data = response.json()
+
+        texts = []
+        if data.get('Answer'):
+            texts.append(data['Answer'])
+        for topic in data.get('RelatedTopics', []):
+            if isinstance(topic, dict) and 'Text' in topic:
+                texts.append(topic['Text'])
+
+        # The first plausible number wins, not just the first number
+        for text in texts:
+            for value in _numbers(text):
+                if is_valid(value):
+                    return value
+        return None
+
+class FileFeedProvider(PriceProvider):
+    """Local JSON feed: {"gold": {"india": 6300.0, "default": 6300.0}, "silver": 75.0}."""
+
+    name = 'file'
+    timeout = 1.0
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._mtime = None
+        self._data = {}
+
+    def _load(self) -> Dict:
+        mtime = os.path.getmtime(self.path)
+        if mtime != self._mtime:
+            with open(self.path) as f:
+                self._data = json.load(f)
+            self._mtime = mtime
+        return self._data
+
+    def fetch(self, asset: str, region: str, is_valid: Validator) -> Optional[float]:
+        entry = self._load().get(asset.lower())
+        if isinstance(entry, dict):
+            entry = entry.get(region, entry.get('default'))
+        return float(entry) if entry is not None else None
+
+class HttpJsonProvider(PriceProvider):
+    """Any HTTP endpoint answering {"price": ...}; `url` may use {asset} and {region}."""
+
+    name = 'http'
+    upstream = True
+
+    def __init__(self, url: str, name: Optional[str] = None):
+        super().__init__()
+        self.url = url
+        if name:
+            self.name = name
+
+    def fetch(self, asset: str, region: str, is_valid: Validator) -> Optional[float]:
+        response = get_session().get(self.url.format(asset=asset.lower(), region=region),
+                                   timeout=self.request_timeout())
+        response.raise_for_status()
+        price = response.json().get('price')
+        return float(price) if price is not None else None
+
+_providers = None
+_providers_lock = threading.Lock()
+_executor = None
+
+def get_providers() -> List[PriceProvider]:
+    """Return the configured providers; PRICE_FEED_FILE and PRICE_HTTP_URL add optional ones."""
+    global _providers
+    if _providers is None:
+        with _providers_lock:
+            if _providers is None:
+                providers = []
+                if os.environ.get('PRICE_FEED_FILE'):
+                    providers.append(FileFeedProvider(os.environ['PRICE_FEED_FILE']))
+                if os.environ.get('PRICE_HTTP_URL'):
+                    providers.append(HttpJsonProvider(os.environ['PRICE_HTTP_URL']))
+                providers.append(DuckDuckGoProvider())
+                _providers = providers
+    return _providers
+
+def register_provider(provider: PriceProvider):
+    """Add a provider to the pool used by `fetch_price`."""
+    get_providers().append(provider)
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared thread pool that runs provider lookups."""
+    global _executor
+    if _executor is None:
+        with _providers_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PROVIDER_WORKERS, thread_name_prefix='price-provider')
+    return _executor
+
+def _run(provider: PriceProvider, asset: str, region: str, is_valid: Validator,
+         timeout: float, finished: threading.Event) -> Optional[float]:
+    # Picked up from the queue after the lookup already returned
+    if finished.is_set():
+        return None
+
+    started = time.monotonic()
+    _call.timeout = timeout
+    try:
+        price = provider.fetch(asset, region, is_valid)
+    except Exception as e:
+        print(f"Error fetching {asset} price from {provider.name}: {e}")
+        price = None
+    finally:
+        del _call.timeout
+
+    ok = price is not None and is_valid(price)
+    provider.record(ok, time.monotonic() - started)
+    return price if ok else None
+
+def fetch_price(asset: str, region: str, is_valid: Validator) -> Tuple[Optional[float], Optional[str]]:
+    """Ask providers in parallel, fastest first, hedging every HEDGE_DELAY seconds.
+
+    Returns (price, provider name) for the first valid answer, or (None, None).
+    A request already in flight cannot be interrupted, so providers still running
+    when an answer arrives keep their worker until they finish. Their read timeout
+    is capped at the time left before FETCH_DEADLINE, and at HEDGED_TIMEOUT for
+    hedges, so an abandoned call never outlives its lookup by more than that.
+    Queued calls that have not started are dropped.
+    """
+    candidates = sorted(
+        (p for p in get_providers() if p.healthy()),
+        key=lambda p: p.latency if p.latency is not None else p.timeout
+    )
+
+    executor = get_executor()
+    deadline = time.monotonic() + FETCH_DEADLINE
+    finished = threading.Event()
+    running = {}
+
+    while candidates or running:
+        # Launch the next provider when hedging is due or nothing is in flight
+        if candidates:
+            provider = candidates.pop(0)
+            if provider.upstream:
+                allowed, _ = take_token(f"upstream:{provider.name}", UPSTREAM_BUDGET_PER_MINUTE / 60, UPSTREAM_BURST)
+                if not allowed:
+                    continue
+            timeout = max(0.1, deadline - time.monotonic())
+            if running:
+                timeout = min(timeout, HEDGED_TIMEOUT)
+            running[executor.submit(_run, provider, asset, region, is_valid, timeout, finished)] = provider
+
+        if not running:
+            continue
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(running, timeout=min(HEDGE_DELAY, remaining) if candidates else remaining,
+                       return_when=FIRST_COMPLETED)
+
+        for future in done:
+            provider = running.pop(future)
+            price = future.result()
+            if price is not None:
+                finished.set()
+                for pending in running:
+                    pending.cancel()
+                return price, provider.name
+
+    finished.set()
+    for pending in running:
+        pending.cancel()
+    return None, None
@@ -0,0 +1,132 @@
+import os
+import time
+import sqlite3
+import threading
+from functools import wraps
+from typing import Dict, Tuple, Optional
+
+from flask import request, jsonify
+
+# How often idle buckets are swept; a bucket is idle once it has refilled to capacity,
+# since a missing bucket starts full anyway
+SWEEP_INTERVAL = 60.0
+
+class MemoryBucketStore:
+    """Token buckets kept in this process only."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _sweep(self, now: float):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._last_sweep = now
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1) -> Tuple[bool, float]:
+        """Take `cost` tokens from bucket `key`; return (allowed, seconds until allowed)."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= SWEEP_INTERVAL:
+                self._sweep(now)
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+class SQLiteBucketStore:
+    """Token buckets in a local SQLite file, shared by all workers on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._last_sweep = time.time()
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL, updated REAL, full_at REAL)')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(bucket)')]
+        if 'full_at' not in columns:
+            conn.execute('ALTER TABLE bucket ADD COLUMN full_at REAL')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_bucket_full_at ON bucket (full_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1) -> Tuple[bool, float]:
+        """Take `cost` tokens from bucket `key`; return (allowed, seconds until allowed)."""
+        # Wall clock, since monotonic clocks are not comparable across processes
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)',
+                         (key, tokens, now, now + (capacity - tokens) / rate))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        # Each worker sweeps on its own schedule; deleting a full bucket never changes a decision
+        if now - self._last_sweep >= SWEEP_INTERVAL:
+            self._last_sweep = now
+            conn.execute('DELETE FROM bucket WHERE full_at IS NULL OR full_at <= ?', (now,))
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return the process-wide bucket store; RATE_LIMIT_DB selects the shared SQLite store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = os.environ.get('RATE_LIMIT_DB')
+                _store = SQLiteBucketStore(path) if path else MemoryBucketStore()
+    return _store
+
+def take_token(key: str, rate: float, capacity: float, cost: float = 1) -> Tuple[bool, float]:
+    """Take tokens from the shared store, failing open if the store is unavailable."""
+    try:
+        return get_store().take(key, rate, capacity, cost)
+    except Exception as e:
+        print(f"Rate limit store error for {key}: {e}")
+        return True, 0.0
+
+def client_id() -> str:
+    """Identify the calling client by its remote address.
+
+    Behind a reverse proxy set TRUSTED_PROXIES so create_app installs ProxyFix and
+    remote_addr reflects X-Forwarded-For; without it every client shares the proxy's bucket.
+    """
+    return request.remote_addr or 'unknown'
+
+def rate_limit(rate: float, capacity: float, scope: Optional[str] = None):
+    """Limit a route to `rate` requests per second per client, with bursts up to `capacity`."""
+    def decorator(view):
+        route = scope or view.__name__
+
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            allowed, retry_after = take_token(f"route:{route}:{client_id()}", rate, capacity)
+            if not allowed:
+                response = jsonify({'status': 'error', 'message': 'Rate limit exceeded'})
+                response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                return response, 429
+            return view(*args, **kwargs)
+
+        return wrapped
+    return decorator
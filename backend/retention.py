@@ -0,0 +1,354 @@
+import json
+import sys
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, or_
+from models import db, Recommendation, RecommendationArchive, RetentionPolicy
+
+DEFAULT_KEEP_LAST = 20          # recommendations kept as full rows per user
+DEFAULT_ROLLUP_AFTER_DAYS = 30  # archived entries older than this keep one per day
+DEFAULT_BATCH_SIZE = 200        # rows moved per transaction
+SNAPSHOT_INTERVAL = 50          # archived entries per segment; each segment starts with a snapshot
+
+def _compact_dumps(data: Any) -> str:
+    return json.dumps(data, separators=(',', ':'))
+
+def _contains_null(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, dict):
+        return any(_contains_null(v) for v in value.values())
+    return False
+
+def make_merge_patch(old: Any, new: Any) -> Any:
+    """Build an RFC 7386 merge patch that turns `old` into `new`."""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return new
+
+    patch = {}
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif old[key] != value:
+            patch[key] = make_merge_patch(old[key], value)
+    return patch
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """Apply an RFC 7386 merge patch to `target`."""
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+def recommendation_state(rec: Recommendation) -> Dict[str, Any]:
+    """Decode the three JSON documents of a recommendation into one state dict."""
+    return {
+        'p': json.loads(rec.portfolio_json) if rec.portfolio_json else None,
+        'e': json.loads(rec.expected_returns_json) if rec.expected_returns_json else None,
+        's': json.loads(rec.source_prices_json) if rec.source_prices_json else None
+    }
+
+def _after(row: RecommendationArchive, inclusive: bool = False):
+    """Filter for archive rows ordered after `row` by (created_at, id)."""
+    same_time = RecommendationArchive.id >= row.id if inclusive else RecommendationArchive.id > row.id
+    return or_(RecommendationArchive.created_at > row.created_at,
+               and_(RecommendationArchive.created_at == row.created_at, same_time))
+
+def _before(row: RecommendationArchive, inclusive: bool = False):
+    """Filter for archive rows ordered before `row` by (created_at, id)."""
+    same_time = RecommendationArchive.id <= row.id if inclusive else RecommendationArchive.id < row.id
+    return or_(RecommendationArchive.created_at < row.created_at,
+               and_(RecommendationArchive.created_at == row.created_at, same_time))
+
+def _ordered(query, descending: bool = False):
+    if descending:
+        return query.order_by(RecommendationArchive.created_at.desc(), RecommendationArchive.id.desc())
+    return query.order_by(RecommendationArchive.created_at.asc(), RecommendationArchive.id.asc())
+
+def _replay(rows: List[RecommendationArchive]) -> List[Tuple[RecommendationArchive, Dict[str, Any]]]:
+    """Reconstruct states for consecutive rows; the first row must be a snapshot."""
+    chain = []
+    state = None
+    for row in rows:
+        payload = json.loads(row.payload_json)
+        state = payload if row.is_snapshot else apply_merge_patch(state, payload)
+        chain.append((row, state))
+    return chain
+
+def _snapshot_at_or_before(user_id: int, row: RecommendationArchive) -> Optional[RecommendationArchive]:
+    return _ordered(RecommendationArchive.query.filter(
+        RecommendationArchive.user_id == user_id,
+        RecommendationArchive.is_snapshot.is_(True),
+        _before(row, inclusive=True)
+    ), descending=True).first()
+
+def load_archive_chain(user_id: int) -> List[Tuple[RecommendationArchive, Dict[str, Any]]]:
+    """Return a user's whole archive, oldest first, with reconstructed states (for batch jobs)."""
+    return _replay(_ordered(RecommendationArchive.query.filter_by(user_id=user_id)).all())
+
+def load_archive_page(user_id: int, offset: int, limit: int) -> List[Tuple[RecommendationArchive, Dict[str, Any]]]:
+    """Return archived entries newest first; replay starts at the nearest snapshot, not the chain head."""
+    rows = _ordered(RecommendationArchive.query.filter_by(user_id=user_id), descending=True).offset(offset).limit(limit).all()
+    if not rows:
+        return []
+
+    snapshot = _snapshot_at_or_before(user_id, rows[-1])
+    replay_rows = _ordered(RecommendationArchive.query.filter(
+        RecommendationArchive.user_id == user_id,
+        _after(snapshot, inclusive=True),
+        _before(rows[0], inclusive=True)
+    )).all()
+
+    states = {row.id: state for row, state in _replay(replay_rows)}
+    return [(row, states[row.id]) for row in rows]
+
+def count_archive(user_id: int) -> int:
+    return RecommendationArchive.query.filter_by(user_id=user_id).count()
+
+def get_policy(user_id: int) -> Tuple[int, int]:
+    """Resolve (keep_last, rollup_after_days) for a user, falling back to app config."""
+    keep_last = current_app.config.get('RETENTION_KEEP_LAST', DEFAULT_KEEP_LAST)
+    rollup_after_days = current_app.config.get('RETENTION_ROLLUP_AFTER_DAYS', DEFAULT_ROLLUP_AFTER_DAYS)
+
+    policy = db.session.get(RetentionPolicy, user_id)
+    if policy:
+        if policy.keep_last is not None:
+            keep_last = policy.keep_last
+        if policy.rollup_after_days is not None:
+            rollup_after_days = policy.rollup_after_days
+
+    # The newest recommendation must stay live for /api/portfolio/operation
+    return max(1, keep_last), max(0, rollup_after_days)
+
+def _get_or_create_policy(user_id: int) -> RetentionPolicy:
+    policy = db.session.get(RetentionPolicy, user_id)
+    if policy is None:
+        policy = RetentionPolicy(user_id=user_id)
+        db.session.add(policy)
+    return policy
+
+def _encode(row: RecommendationArchive, state: Dict[str, Any], previous: Optional[Dict[str, Any]]):
+    """Store `state` on `row` as a snapshot when `previous` is None, else as a patch against it."""
+    if previous is None or _contains_null(state):
+        row.is_snapshot, payload = True, state
+    else:
+        row.is_snapshot, payload = False, make_merge_patch(previous, state)
+    payload_json = _compact_dumps(payload)
+    if row.payload_json != payload_json:
+        row.payload_json = payload_json
+
+def _rollup_segment(user_id: int, cutoff: datetime) -> Tuple[bool, int]:
+    """Roll up the next segment holding archived entries older than `cutoff`.
+
+    Only one segment (at most SNAPSHOT_INTERVAL rows) is read and rewritten per
+    call. Segments start with a snapshot, so dropping rows never touches the
+    encoding of other segments. An entry is dropped when the entry after it,
+    possibly the first of the next segment, falls on the same day. The newest
+    archived entry has no successor yet, so the watermark stays below it until
+    one arrives. Returns (progress made, rows dropped).
+    """
+    policy = _get_or_create_policy(user_id)
+
+    query = RecommendationArchive.query.filter(
+        RecommendationArchive.user_id == user_id,
+        RecommendationArchive.created_at < cutoff
+    )
+    if policy.rolled_up_until is not None:
+        query = query.filter(RecommendationArchive.created_at > policy.rolled_up_until)
+    first = _ordered(query).first()
+    if first is None:
+        return False, 0
+
+    snapshot = _snapshot_at_or_before(user_id, first)
+    next_snapshot = _ordered(RecommendationArchive.query.filter(
+        RecommendationArchive.user_id == user_id,
+        RecommendationArchive.is_snapshot.is_(True),
+        _after(snapshot)
+    )).first()
+
+    segment = RecommendationArchive.query.filter(
+        RecommendationArchive.user_id == user_id,
+        _after(snapshot, inclusive=True)
+    )
+    if next_snapshot is not None:
+        segment = segment.filter(_before(next_snapshot))
+    chain = _replay(_ordered(segment).all())
+
+    dropped = 0
+    previous = None
+    decided = []
+    for index, (row, state) in enumerate(chain):
+        next_row = chain[index + 1][0] if index + 1 < len(chain) else next_snapshot
+        if next_row is not None:
+            decided.append(row)
+        if row.created_at < cutoff and next_row is not None and next_row.created_at.date() == row.created_at.date():
+            db.session.delete(row)
+            dropped += 1
+            continue
+        _encode(row, state, previous)
+        previous = state
+
+    # Rows sharing a timestamp with the undecided tail stay behind the watermark too
+    undecided = [row.created_at for row, _ in chain if row not in decided]
+    watermark = max((row.created_at for row in decided
+                     if row.created_at < cutoff and (not undecided or row.created_at < min(undecided))),
+                    default=None)
+
+    advanced = watermark is not None and (policy.rolled_up_until is None or watermark > policy.rolled_up_until)
+    if advanced:
+        policy.rolled_up_until = watermark
+    return advanced or dropped > 0, dropped
+
+def _tail(user_id: int) -> Tuple[Optional[Dict[str, Any]], int]:
+    """State of the newest archived entry and the size of its segment."""
+    last = _ordered(RecommendationArchive.query.filter_by(user_id=user_id), descending=True).first()
+    if last is None:
+        return None, 0
+
+    snapshot = _snapshot_at_or_before(user_id, last)
+    rows = _ordered(RecommendationArchive.query.filter(
+        RecommendationArchive.user_id == user_id,
+        _after(snapshot, inclusive=True)
+    )).all()
+    return _replay(rows)[-1][1], len(rows)
+
+def compact_user(user_id: int, batch_size: int = DEFAULT_BATCH_SIZE, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Run one bounded compaction batch for a user and commit it.
+
+    A batch rolls up at most one archive segment and archives at most
+    `batch_size` live rows, encoding them against the archive tail only, so
+    its cost does not grow with the size of the user's archive.
+    """
+    now = now or datetime.utcnow()
+    keep_last, rollup_after_days = get_policy(user_id)
+    cutoff = now - timedelta(days=rollup_after_days)
+
+    processed, dropped = _rollup_segment(user_id, cutoff)
+    db.session.flush()
+
+    newest_ids = db.session.query(Recommendation.id).filter_by(user_id=user_id).order_by(
+        Recommendation.created_at.desc(), Recommendation.id.desc()
+    ).limit(keep_last)
+    candidates = Recommendation.query.filter(
+        Recommendation.user_id == user_id,
+        Recommendation.id.notin_(newest_ids)
+    ).order_by(Recommendation.created_at.asc(), Recommendation.id.asc()).limit(batch_size).all()
+
+    # Live rows go after the tail; they are always newer than archived ones
+    previous, segment_size = _tail(user_id)
+    for rec in candidates:
+        if segment_size >= SNAPSHOT_INTERVAL:
+            previous, segment_size = None, 0
+
+        state = recommendation_state(rec)
+        row = RecommendationArchive(
+            user_id=user_id,
+            original_id=rec.id,
+            created_at=rec.created_at or now
+        )
+        _encode(row, state, previous)
+        db.session.add(row)
+        db.session.delete(rec)
+
+        previous = state
+        segment_size = 1 if row.is_snapshot else segment_size + 1
+
+    db.session.commit()
+
+    return {
+        'archived': len(candidates),
+        'rolled_up': dropped,
+        'remaining': len(candidates) == batch_size or processed
+    }
+
+def run_compaction(batch_size: int = DEFAULT_BATCH_SIZE, pause: float = 0.0, user_page: int = 500) -> Dict[str, int]:
+    """Compact every user's history in bounded batches, committing between them."""
+    totals = {'users': 0, 'archived': 0, 'rolled_up': 0}
+    last_user_id = 0
+
+    while True:
+        user_ids = [row[0] for row in db.session.query(Recommendation.user_id).filter(
+            Recommendation.user_id > last_user_id
+        ).group_by(Recommendation.user_id).order_by(Recommendation.user_id).limit(user_page).all()]
+
+        if not user_ids:
+            break
+
+        for user_id in user_ids:
+            totals['users'] += 1
+            while True:
+                try:
+                    stats = compact_user(user_id, batch_size=batch_size)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error compacting history for user {user_id}: {e}")
+                    break
+
+                totals['archived'] += stats['archived']
+                totals['rolled_up'] += stats['rolled_up']
+                if pause:
+                    time.sleep(pause)
+                if not stats['remaining']:
+                    break
+
+        last_user_id = user_ids[-1]
+
+    return totals
+
+_compaction_thread = None
+_compaction_lock = threading.Lock()
+
+def start_compaction_thread(app, interval: float, batch_size: int = DEFAULT_BATCH_SIZE, pause: float = 0.05) -> threading.Thread:
+    """Run `run_compaction` every `interval` seconds in a daemon thread, at most one per process."""
+    global _compaction_thread
+
+    def worker():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    run_compaction(batch_size=batch_size, pause=pause)
+                except Exception as e:
+                    print(f"Error during history compaction: {e}")
+                finally:
+                    db.session.remove()
+
+    with _compaction_lock:
+        if _compaction_thread is None or not _compaction_thread.is_alive():
+            _compaction_thread = threading.Thread(target=worker, name='history-compaction', daemon=True)
+            _compaction_thread.start()
+        return _compaction_thread
+
+if __name__ == "__main__":
+    import argparse
+
+    # Add the current directory to Python path
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Compact recommendation history.')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=0.0, help='seconds to sleep between batches')
+    args = parser.parse_args()
+
+    app = create_app({'WARMUP': False})
+    with app.app_context():
+        db.create_all()
+        totals = run_compaction(batch_size=args.batch_size, pause=args.pause)
+
+    print(f"Compacted history for {totals['users']} users: "
+          f"{totals['archived']} archived, {totals['rolled_up']} rolled up")
@@ -6,11 +6,14 @@ from datetime import datetime, timedelta
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import app
+from app import create_app
 from models import db, User, Recommendation, HistoricalPrice
+from generate_data import price_series
+from analytics import record_recommendation
 
 def create_seed_data():
     """Create and populate database with seed data."""
+    app = create_app({'WARMUP': False})
     
     with app.app_context():
         # Drop and recreate all tables
@@ -131,6 +134,8 @@ def create_seed_data():
                 created_at=rec_data["created_at"]
             )
             db.session.add(recommendation)
+            record_recommendation(created_users[rec_data["user_id"] - 1], rec_data["portfolio"],
+                                  rec_data["expected_returns"], rec_data["created_at"])
         
         db.session.commit()
         
@@ -138,32 +143,24 @@ def create_seed_data():
         historical_prices = []
         base_date = datetime.utcnow().date()
         
-        # Generate 60 days of historical data for gold and silver
-        for days_back in range(1, 61):
-            historical_date = base_date - timedelta(days=days_back)
-            
-            # Gold prices with some variation
-            gold_base = 6200
-            gold_variation = (hash(str(historical_date)) % 200 - 100) * 2  # ±200 variation
-            gold_price = gold_base + gold_variation
-            
-            # Silver prices with some variation  
-            silver_base = 74
-            silver_variation = (hash(str(historical_date)) % 10 - 5) * 0.5  # ±2.5 variation
-            silver_price = silver_base + silver_variation
-            
+        # Generate 60 days of historical data for gold and silver; a seeded
+        # random walk gives the same prices on every run
+        gold_series = price_series('gold', base_date - timedelta(days=60), base_date - timedelta(days=1), seed=42)
+        silver_series = price_series('silver', base_date - timedelta(days=60), base_date - timedelta(days=1), seed=42)
+        
+        for historical_date in gold_series:
             historical_prices.extend([
                 HistoricalPrice(
                     asset='gold',
                     date=historical_date,
-                    price=gold_price,
+                    price=gold_series[historical_date],
                     unit='g',
                     source='seed'
                 ),
                 HistoricalPrice(
                     asset='silver', 
                     date=historical_date,
-                    price=silver_price,
+                    price=silver_series[historical_date],
                     unit='g',
                     source='seed'
                 )
@@ -0,0 +1,197 @@
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from utils import ALLOCATIONS, DEFAULT_RATES, compute_allocation, instrument_return, get_historical_metal_price
+
+RATE_PARAMS = ['FD', 'Bank', 'SIP']   # shocks in percentage points added to the rate
+PRICE_PARAMS = ['gold', 'silver']     # shocks in percent of the current price
+
+MAX_AXES = 3
+MAX_GRID_POINTS = 10000
+
+def _number(value: Any, name: str) -> float:
+    """A finite float; NaN and infinities would make the response invalid JSON."""
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a number")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number")
+    return number
+
+def parse_axis(axis: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate an axis given as {"param", "shocks"} or {"param", "range": [lo, hi], "steps"}."""
+    if not isinstance(axis, dict):
+        raise ValueError("Each axis must be an object")
+    param = axis.get('param')
+    if param not in RATE_PARAMS + PRICE_PARAMS:
+        raise ValueError(f"Unknown axis param '{param}'")
+
+    # Sizes are checked before any list is built, so a huge request costs nothing
+    if 'shocks' in axis:
+        shocks = axis['shocks']
+        if not isinstance(shocks, list):
+            raise ValueError(f"Axis '{param}' shocks must be a list of numbers")
+        if len(shocks) > MAX_GRID_POINTS:
+            raise ValueError(f"Axis '{param}' has more than {MAX_GRID_POINTS} shocks")
+        shocks = [_number(shock, f"Axis '{param}' shock") for shock in shocks]
+    elif 'range' in axis:
+        bounds = axis['range']
+        if not isinstance(bounds, list) or len(bounds) != 2:
+            raise ValueError(f"Axis '{param}' range must be [low, high]")
+        low, high = (_number(value, f"Axis '{param}' range") for value in bounds)
+        steps = axis.get('steps', 11)
+        if isinstance(steps, bool) or not isinstance(steps, int):
+            raise ValueError(f"Axis '{param}' steps must be an integer")
+        if not 2 <= steps <= MAX_GRID_POINTS:
+            raise ValueError(f"Axis '{param}' steps must be between 2 and {MAX_GRID_POINTS}")
+        shocks = [low + (high - low) * index / (steps - 1) for index in range(steps)]
+    else:
+        raise ValueError(f"Axis '{param}' needs 'shocks' or 'range'")
+
+    if not shocks:
+        raise ValueError(f"Axis '{param}' has no shocks")
+    return {'param': param, 'shocks': shocks}
+
+def parse_axes(axes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Validate all axes and the size of the grid they span."""
+    if not isinstance(axes, list) or not axes or len(axes) > MAX_AXES:
+        raise ValueError(f"Provide between 1 and {MAX_AXES} axes")
+    axes = [parse_axis(axis) for axis in axes]
+    if len({axis['param'] for axis in axes}) != len(axes):
+        raise ValueError("Each param may appear on only one axis")
+
+    points = 1
+    for axis in axes:
+        points *= len(axis['shocks'])
+    if points > MAX_GRID_POINTS:
+        raise ValueError(f"Grid has {points} points; the limit is {MAX_GRID_POINTS}")
+    return axes
+
+def parse_location(country: Any = None, lat: Any = None, lon: Any = None) -> Dict[str, Any]:
+    """Validate the optional location hints used to price metals."""
+    if country is not None and not isinstance(country, str):
+        raise ValueError("country must be a string")
+    if lat is not None:
+        lat = _number(lat, 'lat')
+        if not -90 <= lat <= 90:
+            raise ValueError("lat must be between -90 and 90")
+    if lon is not None:
+        lon = _number(lon, 'lon')
+        if not -180 <= lon <= 180:
+            raise ValueError("lon must be between -180 and 180")
+    return {'country': country, 'lat': lat, 'lon': lon}
+
+def parse_inputs(profile: Dict[str, Any], rates: Dict[str, Any], prices: Dict[str, Any],
+                 axes: List[Dict[str, Any]], location: Optional[Dict[str, Any]] = None):
+    """Validate a request before any price is fetched.
+
+    Returns (profile, rates, prices, axes, location), where location holds the
+    country/lat/lon keyword arguments for fetch_metal_price.
+    """
+    if not isinstance(profile, dict) or not isinstance(rates, dict) or not isinstance(prices, dict):
+        raise ValueError("profile, rates and prices must be objects")
+
+    risk_preference = profile.get('risk_preference') or 'medium'
+    if risk_preference not in ALLOCATIONS:
+        raise ValueError(f"Unknown risk_preference '{risk_preference}'")
+    profile = dict(profile, risk_preference=risk_preference)
+    if not isinstance(profile.get('selected_instruments') or [], list):
+        raise ValueError("selected_instruments must be a list")
+    if profile.get('investable_amount') is not None:
+        profile['investable_amount'] = _number(profile['investable_amount'], 'investable_amount')
+
+    rates = {name: _number(value, f"rate {name}") for name, value in rates.items()}
+    prices = {metal: _number(prices[metal], f"price {metal}") for metal in PRICE_PARAMS if metal in prices}
+    location = location or {}
+    location = parse_location(location.get('country'), location.get('lat'), location.get('lon'))
+    return profile, rates, prices, parse_axes(axes), location
+
+def _instrument_value(instrument: str, amount: float, rates: Dict[str, float], prices: Dict[str, float],
+                      baselines: Dict[str, float]) -> float:
+    """One-year projected value of `amount`, using the same formulas as recommend_allocation."""
+    if instrument in RATE_PARAMS:
+        return instrument_return(instrument, amount, rate=rates[instrument])['projected_value']
+    metal = instrument.lower()
+    return instrument_return(instrument, amount, price=prices[metal], baseline_price=baselines[metal])['projected_value']
+
+def rate_sensitivity(profile: Dict[str, Any], rates: Dict[str, float], prices: Dict[str, float],
+                     axes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Total expected ROI over the full grid of shocks.
+
+    Each instrument's projected value depends on a single rate or price, so the
+    portfolio value is a sum of per-axis terms. Every instrument is evaluated
+    once per shock on its own axis and the grid is filled by broadcasting those
+    vectors, instead of re-running the allocation for every grid point.
+    """
+    axes = parse_axes(axes)
+
+    allocation = compute_allocation(profile.get('risk_preference') or 'medium', profile.get('selected_instruments') or [])
+    investable_amount = profile.get('investable_amount') or 100000
+    rates = dict(DEFAULT_RATES, **(rates or {}))
+
+    # Metals are valued against the price 30 days ago, which the shocks leave untouched
+    historical_date = (datetime.utcnow() - timedelta(days=30)).date()
+    baselines = {
+        metal: get_historical_metal_price(metal, historical_date).get('price', prices[metal] * 0.95)
+        for metal in PRICE_PARAMS
+    }
+
+    axis_of = {axis['param']: index for index, axis in enumerate(axes)}
+    constant = 0.0
+    terms = [[0.0] * len(axis['shocks']) for axis in axes]
+
+    for instrument, allocation_percent in allocation.items():
+        if allocation_percent <= 0:
+            continue
+        amount = investable_amount * (allocation_percent / 100)
+        param = instrument if instrument in RATE_PARAMS else instrument.lower()
+
+        if param not in axis_of:
+            constant += _instrument_value(instrument, amount, rates, prices, baselines)
+            continue
+
+        index = axis_of[param]
+        for position, shock in enumerate(axes[index]['shocks']):
+            if param in RATE_PARAMS:
+                shocked_rates, shocked_prices = dict(rates, **{param: rates[param] + shock}), prices
+            else:
+                shocked_rates, shocked_prices = rates, dict(prices, **{param: prices[param] * (1 + shock / 100)})
+            terms[index][position] += _instrument_value(instrument, amount, shocked_rates, shocked_prices, baselines)
+
+    def roi(value: float) -> float:
+        return ((value - investable_amount) / investable_amount) * 100
+
+    def surface(depth: int, partial: float):
+        if depth == len(terms):
+            return roi(partial)
+        return [surface(depth + 1, partial + term) for term in terms[depth]]
+
+    base_value = constant
+    for index, axis in enumerate(axes):
+        param = axis['param']
+        instrument = param if param in RATE_PARAMS else param.capitalize()
+        if allocation.get(instrument, 0) > 0:
+            base_value += _instrument_value(instrument, investable_amount * allocation[instrument] / 100,
+                                            rates, prices, baselines)
+
+    return {
+        'portfolio': allocation,
+        'base_expected_roi_percent': roi(base_value),
+        'axes': [
+            {
+                'param': axis['param'],
+                'shocks': axis['shocks'],
+                'values': [
+                    rates[axis['param']] + shock if axis['param'] in RATE_PARAMS
+                    else prices[axis['param']] * (1 + shock / 100)
+                    for shock in axis['shocks']
+                ]
+            }
+            for axis in axes
+        ],
+        'roi_surface': surface(0, constant)
+    }
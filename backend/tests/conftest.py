@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other by flat name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+import providers
+import ratelimit
+import utils
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'WARMUP': False,
+        'RETENTION_INTERVAL': 0,
+        'TESTING': True
+    })
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(autouse=True)
+def isolated_state(monkeypatch):
+    """Fresh rate-limit buckets, price caches and provider list for every test."""
+    monkeypatch.setattr(ratelimit, '_store', ratelimit.MemoryBucketStore())
+    monkeypatch.setattr(providers, '_providers', [])
+    monkeypatch.setattr(utils, 'price_cache', {})
+    monkeypatch.setattr(utils, 'historical_cache', {})
@@ -0,0 +1,67 @@
+from datetime import date, datetime
+
+import pytest
+
+from analytics import accumulate, cohort_key, merge_aggregates, rebuild_aggregates, query_cohorts
+from generate_data import generate_data
+from models import db, CohortAggregate
+
+def _snapshot():
+    return sorted(
+        (row.day, row.risk_preference, row.investment_goals, row.age_bracket, row.count,
+         round(row.sum_fd, 6), round(row.sum_expected_roi, 6), round(row.sum_investable_amount, 6))
+        for row in CohortAggregate.query.all()
+    )
+
+def test_merge_aggregates_adds_to_existing_rows(app):
+    key = cohort_key('low', 'long-term', 30, datetime(2025, 3, 4, 10))
+    for _ in range(3):
+        aggregates = {}
+        accumulate(aggregates, key, {'FD': 40, 'Gold': 15}, {'total_expected_roi_percent': 6.0}, 1000)
+        merge_aggregates(aggregates)
+    db.session.commit()
+
+    row = CohortAggregate.query.one()
+    assert (row.count, row.sum_fd, row.sum_gold, row.sum_expected_roi, row.sum_investable_amount) == \
+        (3, 120, 45, 18.0, 3000)
+
+def test_rebuild_matches_incremental_aggregates(app):
+    generate_data(users=60, years=0.5, recs_per_user=4, chunk_size=25, end_date=date(2025, 6, 30))
+    incremental = _snapshot()
+    assert incremental
+
+    rebuild_aggregates(batch_size=37)
+    assert _snapshot() == incremental
+    assert not db.inspect(db.engine).has_table('cohort_aggregate_rebuild')
+
+def test_rebuild_includes_archived_recommendations(app):
+    from retention import run_compaction
+
+    app.config['RETENTION_KEEP_LAST'] = 1
+    app.config['RETENTION_ROLLUP_AFTER_DAYS'] = 100000
+    generate_data(users=20, years=0.5, recs_per_user=6, chunk_size=10, end_date=date(2025, 6, 30))
+    incremental = _snapshot()
+
+    assert run_compaction()['archived'] > 0
+    rebuild_aggregates()
+    assert _snapshot() == incremental
+
+def test_query_cohorts_buckets(app):
+    aggregates = {}
+    for day in (date(2025, 3, 3), date(2025, 3, 9), date(2025, 3, 10)):  # Monday, Sunday, Monday
+        accumulate(aggregates, cohort_key('high', 'long-term', 40, datetime.combine(day, datetime.min.time())),
+                   {'SIP': 60}, {'total_expected_roi_percent': 10.0}, 500)
+    merge_aggregates(aggregates)
+    db.session.commit()
+
+    weeks = query_cohorts('risk_preference', bucket='week')
+    assert [(row['bucket'], row['count']) for row in weeks] == [('2025-03-03', 2), ('2025-03-10', 1)]
+    assert query_cohorts('risk_preference', bucket='month')[0]['bucket'] == '2025-03-01'
+
+    with pytest.raises(ValueError):
+        query_cohorts('income')
+
+def test_cohort_endpoint_rejects_bad_dates(client):
+    response = client.get('/api/analytics/cohorts?start=yesterday')
+    assert response.status_code == 400
+    assert 'YYYY-MM-DD' in response.get_json()['message']
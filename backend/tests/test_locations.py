@@ -0,0 +1,46 @@
+import pytest
+
+from locations import resolve_region, normalize_country, DEFAULT_REGION, UNKNOWN_REGION
+
+@pytest.mark.parametrize('value, code', [
+    ('India', 'IN'),
+    ('IN', 'IN'),
+    ('ind', 'IN'),
+    ('Bharat', 'IN'),
+    ('U.S.A.', 'US'),
+    ('united states of america', 'US'),
+    ('Great Britain', 'GB'),
+    ('Dubai', 'AE'),
+    ('Atlantis', None),
+    ('', None)
+])
+def test_normalize_country_aliases(value, code):
+    assert normalize_country(value) == code
+
+@pytest.mark.parametrize('country, region', [
+    ('IN', 'india'),
+    ('usa', 'united states'),
+    ('UK', 'united kingdom'),
+    ('Europe', 'europe'),  # region names pass through
+    ('Russia', UNKNOWN_REGION),
+    ('Atlantis', UNKNOWN_REGION)
+])
+def test_resolve_region_from_country(country, region):
+    assert resolve_region(country) == region
+
+@pytest.mark.parametrize('lat, lon, region', [
+    (19.07, 72.88, 'india'),           # Mumbai
+    (40.71, -74.01, 'united states'),  # New York
+    (51.51, -0.13, 'united kingdom'),  # London
+    (25.20, 55.27, 'uae'),             # Dubai
+    (0.0, -150.0, UNKNOWN_REGION),     # open Pacific
+    (95.0, 10.0, UNKNOWN_REGION)       # out of range
+])
+def test_resolve_region_from_coordinates(lat, lon, region):
+    assert resolve_region(lat=lat, lon=lon) == region
+
+def test_resolve_region_prefers_country_over_coordinates():
+    assert resolve_region('IN', lat=40.71, lon=-74.01) == 'india'
+
+def test_resolve_region_without_hints_uses_default():
+    assert resolve_region() == DEFAULT_REGION
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+import providers
+import utils
+from providers import PriceProvider, fetch_price
+
+class StubProvider(PriceProvider):
+    def __init__(self, name, price, delay=0.0, latency=None, upstream=False):
+        super().__init__()
+        self.name = name
+        self.price = price
+        self.delay = delay
+        self.latency = latency
+        self.upstream = upstream
+        self.calls = 0
+
+    def fetch(self, asset, region, is_valid):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.price
+
+@pytest.fixture(autouse=True)
+def fast_hedging(monkeypatch):
+    monkeypatch.setattr(providers, 'HEDGE_DELAY', 0.05)
+
+def test_hedged_request_returns_first_valid_answer(monkeypatch):
+    slow = StubProvider('slow', 100.0, delay=0.5, latency=0.01)
+    fast = StubProvider('fast', 200.0, latency=0.02)
+    monkeypatch.setattr(providers, '_providers', [slow, fast])
+
+    started = time.monotonic()
+    assert fetch_price('gold', 'india', lambda price: price > 0) == (200.0, 'fast')
+    assert time.monotonic() - started < 0.4
+
+def test_invalid_answers_fall_through_to_the_next_provider(monkeypatch):
+    implausible = StubProvider('implausible', 1.0, latency=0.01)
+    good = StubProvider('good', 6200.0, latency=0.02)
+    monkeypatch.setattr(providers, '_providers', [implausible, good])
+
+    assert fetch_price('gold', 'india', lambda price: 3000 <= price <= 12000) == (6200.0, 'good')
+
+def test_no_answer_returns_none(monkeypatch):
+    monkeypatch.setattr(providers, '_providers', [StubProvider('empty', None)])
+    assert fetch_price('gold', 'india', lambda price: price > 0) == (None, None)
+
+def test_exhausted_upstream_budget_serves_stale_price(app, monkeypatch):
+    upstream = StubProvider('upstream', 6300.0, upstream=True)
+    monkeypatch.setattr(providers, '_providers', [upstream])
+    monkeypatch.setattr(providers, 'UPSTREAM_BURST', 1)
+    monkeypatch.setattr(providers, 'UPSTREAM_BUDGET_PER_MINUTE', 0.001)
+    monkeypatch.setattr(utils, 'CACHE_DURATION', 0)
+
+    first = utils.fetch_metal_price('gold', country='IN')
+    assert first['price'] == 6300.0 and first['source'] == 'upstream'
+
+    second = utils.fetch_metal_price('gold', country='IN')
+    assert upstream.calls == 1
+    assert second['price'] == 6300.0 and second['stale'] is True
+
+def test_exhausted_upstream_budget_without_cache_serves_seed_price(app, monkeypatch):
+    upstream = StubProvider('upstream', 6300.0, upstream=True)
+    monkeypatch.setattr(providers, '_providers', [upstream])
+    monkeypatch.setattr(providers, 'UPSTREAM_BURST', 0)
+
+    result = utils.fetch_metal_price('silver', country='IN')
+    assert upstream.calls == 0
+    assert result['source'] == 'seed'
+    assert result['price'] == utils.SEED_PRICES['silver']
@@ -0,0 +1,65 @@
+import pytest
+
+import ratelimit
+from ratelimit import MemoryBucketStore, SQLiteBucketStore
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBucketStore()
+    return SQLiteBucketStore(str(tmp_path / 'buckets.db'))
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: now[0])
+    return now
+
+def _keys(store):
+    if isinstance(store, MemoryBucketStore):
+        return set(store._buckets)
+    return {row[0] for row in store._connect().execute('SELECT key FROM bucket')}
+
+def test_bucket_allows_burst_then_refills(store, clock):
+    assert [store.take('client', rate=1, capacity=3)[0] for _ in range(4)] == [True, True, True, False]
+
+    allowed, retry_after = store.take('client', rate=1, capacity=3)
+    assert not allowed and retry_after == pytest.approx(1.0)
+
+    clock[0] += 1.0
+    assert store.take('client', rate=1, capacity=3)[0]
+
+def test_buckets_are_independent(store, clock):
+    store.take('a', rate=1, capacity=1)
+    assert not store.take('a', rate=1, capacity=1)[0]
+    assert store.take('b', rate=1, capacity=1)[0]
+
+def test_full_buckets_are_evicted(store, clock, monkeypatch):
+    # Fresh stores sweep SWEEP_INTERVAL after creation
+    monkeypatch.setattr(ratelimit, 'SWEEP_INTERVAL', 10.0)
+    store._last_sweep = clock[0]
+
+    store.take('idle', rate=1, capacity=5)       # full again after 1 s
+    store.take('busy', rate=0.01, capacity=5)    # full again after 100 s
+    clock[0] += 11.0
+    store.take('new', rate=1, capacity=5)
+
+    assert _keys(store) == {'busy', 'new'}
+
+def test_rate_limited_route_returns_429(client):
+    for _ in range(20):
+        assert client.post('/api/sensitivity', json={}).status_code == 400
+    response = client.post('/api/sensitivity', json={})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_trusted_proxy_sets_client_address(monkeypatch):
+    from app import create_app
+
+    seen = []
+    monkeypatch.setattr(ratelimit, 'take_token', lambda key, *args: seen.append(key) or (True, 0.0))
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'WARMUP': False, 'TRUSTED_PROXIES': 1})
+    app.test_client().post('/api/sensitivity', json={}, headers={'X-Forwarded-For': '203.0.113.7'})
+
+    assert seen == ['route:get_sensitivity:203.0.113.7']
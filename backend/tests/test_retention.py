@@ -0,0 +1,177 @@
+import json
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+import retention
+from models import db, User, Recommendation, RecommendationArchive
+from retention import make_merge_patch, apply_merge_patch, run_compaction, compact_user
+
+NOW = datetime(2026, 1, 1, 12, 0)
+
+@pytest.mark.parametrize('old, new', [
+    ({'a': 1, 'b': {'c': 2, 'd': 3}}, {'a': 1, 'b': {'c': 4}}),
+    ({'a': 1}, {'a': 1, 'b': [1, 2], 'c': {'d': {'e': 'f'}}}),
+    ({'a': {'b': 1}}, {'a': 5}),
+    ({'a': [1, 2, 3]}, {'a': [3]}),
+    ({'a': 1, 'b': 2}, {}),
+    ({}, {'a': {'b': {}}})
+])
+def test_merge_patch_round_trip(old, new):
+    assert apply_merge_patch(old, make_merge_patch(old, new)) == new
+
+def test_states_with_null_values_survive_archiving(app):
+    user = _user()
+    portfolios = [{'FD': 10, 'Gold': 5}, {'FD': None, 'Gold': 5}, {'FD': 20, 'Gold': None}, {'FD': 20, 'Gold': 5}]
+    for index, portfolio in enumerate(portfolios):
+        _recommendation(user, NOW - timedelta(hours=10 - index), portfolio=portfolio)
+    db.session.commit()
+
+    app.config['RETENTION_KEEP_LAST'] = 1
+    app.config['RETENTION_ROLLUP_AFTER_DAYS'] = 1000
+    compact_user(user.id, now=NOW)
+
+    chain = retention.load_archive_chain(user.id)
+    assert [state['p'] for _, state in chain] == portfolios[:3]
+
+def test_compaction_keeps_history_byte_equal_across_pages(app, client, monkeypatch):
+    monkeypatch.setattr(retention, 'SNAPSHOT_INTERVAL', 7)
+    app.config['RETENTION_KEEP_LAST'] = 5
+    app.config['RETENTION_ROLLUP_AFTER_DAYS'] = 1000
+
+    user = _user()
+    rng = random.Random(7)
+    for index in range(120):
+        _recommendation(user, NOW - timedelta(hours=6 * (120 - index)), portfolio={
+            'FD': rng.randint(0, 5), 'Gold': 15, 'Extra': rng.choice([None, 1, {'x': rng.randint(0, 2)}])
+        })
+    db.session.commit()
+
+    before = _full_history(client, user.id)
+    run_compaction(batch_size=9)
+    after = _full_history(client, user.id)
+
+    assert Recommendation.query.count() == 5
+    assert RecommendationArchive.query.count() == 115
+    assert [_canonical(entry) for entry in after] == [_canonical(entry) for entry in before]
+
+    # Every segment starts with a snapshot and holds at most SNAPSHOT_INTERVAL rows
+    segment = 0
+    for row, _ in retention.load_archive_chain(user.id):
+        segment = 1 if row.is_snapshot else segment + 1
+        assert segment <= 7
+
+def test_history_pages_do_not_overlap(app, client):
+    app.config['RETENTION_KEEP_LAST'] = 3
+    app.config['RETENTION_ROLLUP_AFTER_DAYS'] = 1000
+
+    user = _user()
+    for index in range(30):
+        _recommendation(user, NOW - timedelta(hours=30 - index))
+    db.session.commit()
+    run_compaction()
+
+    first = client.get(f'/api/user/{user.id}/history?limit=4').get_json()
+    assert first['total'] == 30
+    assert first['next_offset'] == 4
+    second = client.get(f'/api/user/{user.id}/history?limit=4&offset=4').get_json()
+    ids = [entry['id'] for entry in first['history'] + second['history']]
+    assert len(set(ids)) == 8
+
+    last = client.get(f'/api/user/{user.id}/history?limit=50&offset=28').get_json()
+    assert len(last['history']) == 2
+    assert last['next_offset'] is None
+
+def test_rollup_keeps_one_entry_per_old_day_across_segment_boundaries(app, monkeypatch):
+    # Short segments put many same-day pairs on either side of a boundary
+    monkeypatch.setattr(retention, 'SNAPSHOT_INTERVAL', 7)
+    app.config['RETENTION_KEEP_LAST'] = 3
+    app.config['RETENTION_ROLLUP_AFTER_DAYS'] = 10
+
+    user = _user()
+    rng = random.Random(3)
+    for created_at in sorted(NOW - timedelta(days=rng.uniform(0, 40)) for _ in range(300)):
+        _recommendation(user, created_at)
+    db.session.commit()
+
+    _compact_all(user.id, batch_size=40)
+    cutoff = NOW - timedelta(days=10)
+    per_day = Counter(row.created_at.date() for row in RecommendationArchive.query.all() if row.created_at < cutoff)
+    assert max(per_day.values()) == 1
+
+    # A second pass finds nothing left to do
+    assert _compact_all(user.id, batch_size=40) == 0
+
+def test_rollup_waits_for_the_successor_of_the_newest_archived_entry(app, monkeypatch):
+    monkeypatch.setattr(retention, 'SNAPSHOT_INTERVAL', 3)
+    app.config['RETENTION_KEEP_LAST'] = 1
+    app.config['RETENTION_ROLLUP_AFTER_DAYS'] = 1
+
+    user = _user()
+    day = NOW - timedelta(days=5)
+    for created_at in (day - timedelta(days=2), day - timedelta(days=1), day + timedelta(hours=3),
+                       day + timedelta(hours=4)):
+        _recommendation(user, created_at)
+    db.session.commit()
+
+    # The archive fills one segment; its newest entry has no successor yet and is kept
+    _compact_all(user.id)
+    assert RecommendationArchive.query.count() == 3
+
+    # Later entries from the same day land in a new segment
+    _recommendation(user, day + timedelta(hours=5))
+    _recommendation(user, NOW)
+    db.session.commit()
+    _compact_all(user.id)
+
+    same_day = [row.created_at for row in RecommendationArchive.query.all() if row.created_at.date() == day.date()]
+    assert same_day == [day + timedelta(hours=5)]
+
+def test_retention_policy_rejects_invalid_values(client):
+    user = _user()
+    assert client.put(f'/api/user/{user.id}/retention', json={'keep_last': 'abc'}).status_code == 400
+    assert client.put(f'/api/user/{user.id}/retention', json={'rollup_after_days': -1}).status_code == 400
+    assert client.put(f'/api/user/{user.id}/retention', json={'keep_last': True}).status_code == 400
+
+    response = client.put(f'/api/user/{user.id}/retention', json={'keep_last': 3, 'rollup_after_days': None})
+    assert response.status_code == 200
+    assert response.get_json()['retention']['keep_last'] == 3
+
+def _user():
+    user = User(name='Test', age=30, risk_preference='medium', investment_goals='long-term',
+                selected_instruments='["FD"]', rates_json='{}', investable_amount=1000)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def _recommendation(user, created_at, portfolio=None):
+    db.session.add(Recommendation(
+        user_id=user.id,
+        portfolio_json=json.dumps(portfolio if portfolio is not None else {'FD': 100}),
+        expected_returns_json=json.dumps({'total_expected_roi_percent': created_at.hour}),
+        source_prices_json=json.dumps({'gold': {'price': 6000 + created_at.day}}),
+        created_at=created_at
+    ))
+
+def _compact_all(user_id, batch_size=retention.DEFAULT_BATCH_SIZE):
+    """Compact until a batch changes nothing; rollups of newly archived rows happen on the next batch."""
+    dropped = 0
+    while True:
+        stats = compact_user(user_id, batch_size=batch_size, now=NOW)
+        dropped += stats['rolled_up']
+        if not (stats['remaining'] or stats['archived']):
+            return dropped
+
+def _full_history(client, user_id):
+    entries, offset = [], 0
+    while offset is not None:
+        page = client.get(f'/api/user/{user_id}/history?limit=13&offset={offset}').get_json()
+        entries += page['history']
+        offset = page['next_offset']
+    return entries
+
+def _canonical(entry):
+    return (entry['id'], entry['created_at'],
+            json.dumps(entry['portfolio'], sort_keys=True), json.dumps(entry['expected_returns'], sort_keys=True))
@@ -1,18 +1,72 @@
-import requests
 import json
 import time
 from datetime import datetime, timedelta, date
-from typing import Dict, Any, Optional
-import re
+from typing import Dict, Any, Optional, Callable
 from models import HistoricalPrice, db
+from locations import resolve_region, DEFAULT_REGION, UNKNOWN_REGION
+from providers import fetch_price
 
 # In-memory cache for price data
 price_cache = {}
 CACHE_DURATION = 600  # 10 minutes
 
+# Provider answers must sit within this band around the recent historical median
+SANITY_BAND = (0.5, 2.0)
+SANITY_WINDOW = 7  # most recent HistoricalPrice rows used as reference
+
+# In-memory copy of recent HistoricalPrice rows: {asset: ({date: record}, loaded_at, days)}
+historical_cache = {}
+HISTORICAL_CACHE_DURATION = 3600  # 1 hour
+HISTORICAL_CACHE_DAYS = 90        # window loaded when no warm-up set one
+
+SEED_PRICES = {
+    'gold': 6230.50,  # per gram in INR
+    'silver': 74.25   # per gram in INR
+}
+
+def _degraded_price(asset: str, cache_key: str, location: str) -> Dict[str, Any]:
+    """Serve the last cached price, even if expired, or the seed price."""
+    if cache_key in price_cache:
+        cached_data, _ = price_cache[cache_key]
+        return dict(cached_data, stale=True)
+    
+    return {
+        "asset": asset,
+        "price": SEED_PRICES.get(asset.lower(), 5000.0),
+        "unit": "g",
+        "source": "seed",
+        "timestamp": datetime.utcnow().isoformat(),
+        "location": location,
+        "location_recognized": location != UNKNOWN_REGION
+    }
+
+def _price_validator(asset: str, location: str) -> Callable[[float], bool]:
+    """Build a plausibility check for provider answers from recent HistoricalPrice rows."""
+    reference = None
+    
+    # Stored history is per gram in INR, so it only anchors the default region
+    if location == DEFAULT_REGION:
+        try:
+            records = HistoricalPrice.query.filter_by(asset=asset.lower()).order_by(
+                HistoricalPrice.date.desc()
+            ).limit(SANITY_WINDOW).all()
+            prices = sorted(record.price for record in records)
+            if prices:
+                reference = prices[len(prices) // 2]
+        except Exception as e:
+            print(f"Error loading reference price for {asset}: {e}")
+    
+    if reference is None:
+        return lambda price: price > 0
+    
+    low, high = reference * SANITY_BAND[0], reference * SANITY_BAND[1]
+    return lambda price: low <= price <= high
+
 def fetch_metal_price(asset: str, country: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> Dict[str, Any]:
-    """Fetch metal prices using DuckDuckGo API with fallbacks."""
-    cache_key = f"{asset}_{country or 'default'}"
+    """Fetch metal prices from the configured providers with fallbacks."""
+    # Cache and query per canonical region, so "India", "IN" and nearby coordinates share an entry
+    location = resolve_region(country, lat, lon)
+    cache_key = f"{asset.lower()}_{location}"
     
     # Check cache
     if cache_key in price_cache:
@@ -20,60 +74,12 @@ def fetch_metal_price(asset: str, country: Optional[str] = None, lat: Optional[f
         if time.time() - timestamp < CACHE_DURATION:
             return cached_data
     
-    # Determine location string for query
-    location = country or "india"  # default to India if no location
-    
     try:
-        # Primary: DuckDuckGo Instant Answer API
-        query = f"{asset} price {location}"
-        url = f"https://api.duckduckgo.com"
-        params = {
-            'q': query,
-            'format': 'json',
-            'no_html': '1',
-            'skip_disambig': '1'
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        price, source = fetch_price(asset, location, _price_validator(asset, location))
         
-        # Parse price from Answer or RelatedTopics
-        price = None
-        source = "duckduckgo"
-        
-        if 'Answer' in data and data['Answer']:
-            # Extract numeric price from answer text
-            answer_text = data['Answer']
-            price_match = re.search(r'[\d,]+\.?\d*', answer_text)
-            if price_match:
-                price_str = price_match.group().replace(',', '')
-                try:
-                    price = float(price_str)
-                except ValueError:
-                    price = None
-        
-        # If no price from Answer, try RelatedTopics
-        if not price and 'RelatedTopics' in data:
-            for topic in data['RelatedTopics']:
-                if isinstance(topic, dict) and 'Text' in topic:
-                    price_match = re.search(r'[\d,]+\.?\d*', topic['Text'])
-                    if price_match:
-                        price_str = price_match.group().replace(',', '')
-                        try:
-                            price = float(price_str)
-                            break
-                        except ValueError:
-                            continue
-        
-        # Fallback: Use seed prices if DuckDuckGo fails
-        if not price:
-            fallback_prices = {
-                'gold': 6230.50,  # per gram in INR
-                'silver': 74.25   # per gram in INR
-            }
-            price = fallback_prices.get(asset.lower(), 5000.0)
-            source = "seed"
+        # Fallback: last cached or seed price if no provider answered
+        if price is None:
+            return _degraded_price(asset, cache_key, location)
         
         result = {
             "asset": asset,
@@ -81,7 +87,8 @@ def fetch_metal_price(asset: str, country: Optional[str] = None, lat: Optional[f
             "unit": "g",
             "source": source,
             "timestamp": datetime.utcnow().isoformat(),
-            "location": location
+            "location": location,
+            "location_recognized": location != UNKNOWN_REGION
         }
         
         # Cache result
@@ -92,24 +99,59 @@ def fetch_metal_price(asset: str, country: Optional[str] = None, lat: Optional[f
     except Exception as e:
         print(f"Error fetching {asset} price: {e}")
         # Emergency fallback
-        fallback_prices = {
-            'gold': 6230.50,
-            'silver': 74.25
-        }
         result = {
             "asset": asset,
-            "price": fallback_prices.get(asset.lower(), 5000.0),
+            "price": SEED_PRICES.get(asset.lower(), 5000.0),
             "unit": "g",
             "source": "fallback",
             "timestamp": datetime.utcnow().isoformat(),
             "location": location,
+            "location_recognized": location != UNKNOWN_REGION,
             "error": str(e)
         }
         return result
 
+def load_historical_prices(asset: str, days: int = HISTORICAL_CACHE_DAYS) -> Dict[date, Dict[str, Any]]:
+    """Load the last `days` of HistoricalPrice rows for an asset into memory."""
+    since = datetime.utcnow().date() - timedelta(days=days)
+    records = HistoricalPrice.query.filter(
+        HistoricalPrice.asset == asset.lower(),
+        HistoricalPrice.date >= since
+    ).all()
+    
+    series = {
+        record.date: {
+            'price': record.price,
+            'date': record.date.isoformat(),
+            'unit': record.unit,
+            'source': record.source
+        }
+        for record in records
+    }
+    historical_cache[asset.lower()] = (series, time.time(), days)
+    return series
+
+def _cached_historical_price(asset: str, target_date: date) -> Optional[Dict[str, Any]]:
+    """Closest cached record within 7 days of `target_date`, loading the series when missing or expired."""
+    entry = historical_cache.get(asset.lower())
+    if entry is None or time.time() - entry[1] >= HISTORICAL_CACHE_DURATION:
+        series = load_historical_prices(asset, days=entry[2] if entry else HISTORICAL_CACHE_DAYS)
+    else:
+        series = entry[0]
+    
+    for offset in range(8):
+        for candidate in (target_date - timedelta(days=offset), target_date + timedelta(days=offset)):
+            if candidate in series:
+                return series[candidate]
+    return None
+
 def get_historical_metal_price(asset: str, target_date: date) -> Dict[str, Any]:
     """Get historical metal price for a specific date."""
     try:
+        cached = _cached_historical_price(asset, target_date)
+        if cached:
+            return cached
+        
         # Query database for historical price
         historical_record = HistoricalPrice.query.filter_by(
             asset=asset.lower(),
@@ -231,19 +273,52 @@ def calc_metal_roi(current_price: float, baseline_price: float) -> float:
         return 0
     return ((current_price - baseline_price) / baseline_price) * 100
 
-def recommend_allocation(user_data: Dict, current_prices: Dict, rates: Dict) -> Dict[str, Any]:
-    """Generate portfolio allocation based on user profile and current market data."""
-    risk_preference = user_data.get('risk_preference', 'medium')
-    selected_instruments = json.loads(user_data.get('selected_instruments', '[]'))
-    
-    # Base allocation templates
-    allocations = {
-        'low': {'FD': 45, 'Bank': 25, 'SIP': 10, 'Gold': 15, 'Silver': 5},
-        'medium': {'FD': 25, 'Bank': 15, 'SIP': 40, 'Gold': 15, 'Silver': 5},
-        'high': {'FD': 10, 'Bank': 10, 'SIP': 60, 'Gold': 15, 'Silver': 5}
+# Annual rates used when a user has not set their own
+DEFAULT_RATES = {'FD': 6.5, 'Bank': 3.5, 'SIP': 12.0}
+
+def instrument_return(instrument: str, amount: float, rate: Optional[float] = None,
+                      price: Optional[float] = None, baseline_price: Optional[float] = None) -> Dict[str, float]:
+    """One-year projection for `amount` placed in an instrument.
+
+    FD, Bank and SIP need the annual `rate`; the SIP invests `amount` in twelve
+    monthly instalments. Gold and Silver move with `price` against `baseline_price`.
+    """
+    if instrument in ['Gold', 'Silver']:
+        metal_roi = calc_metal_roi(price, baseline_price)
+        return {
+            'price': price,
+            'historical_price': baseline_price,
+            'amount': amount,
+            'projected_value': amount * (1 + metal_roi / 100),
+            'roi_percent': metal_roi
+        }
+
+    if instrument == 'FD':
+        returns = calc_fd_return(amount, rate)
+    elif instrument == 'Bank':
+        returns = calc_bank_return(amount, rate)
+    elif instrument == 'SIP':
+        returns = calc_sip_return(amount / 12, rate)
+    else:
+        raise ValueError(f"Unknown instrument '{instrument}'")
+
+    return {
+        'rate': rate,
+        'amount': amount,
+        'projected_value': returns['future_value'],
+        'roi_percent': returns['roi_percent']
     }
-    
-    base_allocation = allocations[risk_preference]
+
+# Base allocation templates
+ALLOCATIONS = {
+    'low': {'FD': 45, 'Bank': 25, 'SIP': 10, 'Gold': 15, 'Silver': 5},
+    'medium': {'FD': 25, 'Bank': 15, 'SIP': 40, 'Gold': 15, 'Silver': 5},
+    'high': {'FD': 10, 'Bank': 10, 'SIP': 60, 'Gold': 15, 'Silver': 5}
+}
+
+def compute_allocation(risk_preference: str, selected_instruments) -> Dict[str, float]:
+    """Percentage allocation per instrument for a risk preference and instrument selection."""
+    base_allocation = ALLOCATIONS[risk_preference]
     
     # Zero out unselected instruments and redistribute
     final_allocation = {}
@@ -268,6 +343,15 @@ def recommend_allocation(user_data: Dict, current_prices: Dict, rates: Dict) ->
         for instrument in final_allocation:
             final_allocation[instrument] = round(final_allocation[instrument] * scale_factor, 1)
     
+    return final_allocation
+
+def recommend_allocation(user_data: Dict, current_prices: Dict, rates: Dict) -> Dict[str, Any]:
+    """Generate portfolio allocation based on user profile and current market data."""
+    risk_preference = user_data.get('risk_preference', 'medium')
+    selected_instruments = json.loads(user_data.get('selected_instruments', '[]'))
+    
+    final_allocation = compute_allocation(risk_preference, selected_instruments)
+    
     # Calculate expected returns
     investable_amount = user_data.get('investable_amount', 100000)
     expected_returns = {}
@@ -276,39 +360,11 @@ def recommend_allocation(user_data: Dict, current_prices: Dict, rates: Dict) ->
     for instrument, allocation_percent in final_allocation.items():
         amount = investable_amount * (allocation_percent / 100)
         
-        if instrument == 'FD' and allocation_percent > 0:
-            fd_rate = rates.get('FD', 6.5)
-            returns = calc_fd_return(amount, fd_rate)
-            expected_returns[instrument] = {
-                'rate': fd_rate,
-                'amount': amount,
-                'projected_value': returns['future_value'],
-                'roi_percent': returns['roi_percent']
-            }
-            total_portfolio_value += returns['future_value']
-            
-        elif instrument == 'Bank' and allocation_percent > 0:
-            bank_rate = rates.get('Bank', 3.5)
-            returns = calc_bank_return(amount, bank_rate)
-            expected_returns[instrument] = {
-                'rate': bank_rate,
-                'amount': amount,
-                'projected_value': returns['future_value'],
-                'roi_percent': returns['roi_percent']
-            }
-            total_portfolio_value += returns['future_value']
-            
-        elif instrument == 'SIP' and allocation_percent > 0:
-            sip_rate = rates.get('SIP', 12.0)
-            monthly_amount = amount / 12
-            returns = calc_sip_return(monthly_amount, sip_rate)
-            expected_returns[instrument] = {
-                'rate': sip_rate,
-                'amount': amount,
-                'projected_value': returns['future_value'],
-                'roi_percent': returns['roi_percent']
-            }
-            total_portfolio_value += returns['future_value']
+        if instrument in ['FD', 'Bank', 'SIP'] and allocation_percent > 0:
+            expected_returns[instrument] = instrument_return(
+                instrument, amount, rate=rates.get(instrument, DEFAULT_RATES[instrument])
+            )
+            total_portfolio_value += expected_returns[instrument]['projected_value']
             
         elif instrument in ['Gold', 'Silver']:
             # For metals, use actual historical data for baseline
@@ -319,19 +375,12 @@ def recommend_allocation(user_data: Dict, current_prices: Dict, rates: Dict) ->
             historical_data = get_historical_metal_price(instrument.lower(), historical_date)
             baseline_price = historical_data.get('price', current_price * 0.95)
             
-            metal_roi = calc_metal_roi(current_price, baseline_price)
-            projected_value = amount * (1 + metal_roi / 100)
-            
-            expected_returns[instrument] = {
-                'price': current_price,
-                'source': current_prices.get(instrument.lower(), {}).get('source', 'fallback'),
-                'historical_price': baseline_price,
-                'historical_date': historical_date.isoformat(),
-                'amount': amount,
-                'projected_value': projected_value,
-                'roi_percent': metal_roi
-            }
-            total_portfolio_value += projected_value
+            expected_returns[instrument] = dict(
+                instrument_return(instrument, amount, price=current_price, baseline_price=baseline_price),
+                source=current_prices.get(instrument.lower(), {}).get('source', 'fallback'),
+                historical_date=historical_date.isoformat()
+            )
+            total_portfolio_value += expected_returns[instrument]['projected_value']
     
     total_expected_roi_percent = ((total_portfolio_value - investable_amount) / investable_amount) * 100
     expected_returns['total_expected_roi_percent'] = total_expected_roi_percent
@@ -0,0 +1,48 @@
+import time
+from typing import Callable, List
+
+from locations import load_locations, DEFAULT_REGION
+from providers import get_providers, get_executor
+from utils import load_historical_prices, fetch_metal_price
+
+METAL_ASSETS = ['gold', 'silver']
+
+_hooks: List[Callable] = []
+
+def register_warmup(hook: Callable):
+    """Register `hook(app)` to run inside an app context before serving traffic."""
+    _hooks.append(hook)
+    return hook
+
+@register_warmup
+def warm_locations(app):
+    load_locations()
+
+@register_warmup
+def warm_providers(app):
+    get_providers()
+    get_executor()
+
+@register_warmup
+def warm_historical_prices(app):
+    for asset in METAL_ASSETS:
+        load_historical_prices(asset, days=app.config['WARMUP_HISTORY_DAYS'])
+
+@register_warmup
+def warm_price_cache(app):
+    # Off by default: every worker would spend upstream budget at start
+    if app.config['WARMUP_PRICES']:
+        for asset in METAL_ASSETS:
+            fetch_metal_price(asset, country=DEFAULT_REGION)
+
+def run_warmup(app):
+    """Run every warm-up hook, reporting failures without stopping start-up."""
+    with app.app_context():
+        for hook in _hooks:
+            started = time.perf_counter()
+            try:
+                hook(app)
+            except Exception as e:
+                print(f"Warm-up step {hook.__name__} failed: {e}")
+                continue
+            app.logger.debug(f"Warm-up step {hook.__name__} took {time.perf_counter() - started:.3f}s")
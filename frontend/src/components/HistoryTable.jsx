@@ -1,6 +1,6 @@
 import { Calendar, TrendingUp, RotateCcw } from 'lucide-react'
 
-export default function HistoryTable({ history, onUseRecommendation }) {
+export default function HistoryTable({ history, total, onUseRecommendation }) {
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleDateString('en-IN', {
       year: 'numeric',
@@ -40,7 +40,7 @@ export default function HistoryTable({ history, onUseRecommendation }) {
               </div>
               <div>
                 <h4 className="font-medium text-gray-900">
-                  Recommendation #{history.length - index}
+                  Recommendation #{(total ?? history.length) - index}
                 </h4>
                 <p className="text-sm text-gray-600">{formatDate(rec.created_at)}</p>
               </div>
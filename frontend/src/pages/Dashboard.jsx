@@ -12,6 +12,8 @@ export default function Dashboard() {
   
   const [recommendation, setRecommendation] = useState(null)
   const [history, setHistory] = useState([])
+  const [historyTotal, setHistoryTotal] = useState(0)
+  const [historyNextOffset, setHistoryNextOffset] = useState(null)
   const [user, setUser] = useState(null)
   const [isLoading, setIsLoading] = useState(true)
   const [error, setError] = useState(null)
@@ -77,13 +79,15 @@ export default function Dashboard() {
     }
   }
 
-  const fetchHistory = async () => {
+  const fetchHistory = async (offset = 0) => {
     try {
-      const response = await fetch(buildApiUrl(`${API_ENDPOINTS.USER_HISTORY}/${userId}/history`))
+      const response = await fetch(buildApiUrl(`${API_ENDPOINTS.USER_HISTORY}/${userId}/history?offset=${offset}`))
       const data = await response.json()
       
       if (data.status === 'ok') {
-        setHistory(data.history)
+        setHistory(previous => offset === 0 ? data.history : [...previous, ...data.history])
+        setHistoryTotal(data.total)
+        setHistoryNextOffset(data.next_offset)
       } else {
         console.error('Error fetching history:', data.message)
       }
@@ -232,7 +236,15 @@ export default function Dashboard() {
                 <History className="h-6 w-6 text-blue-600" />
                 <h2 className="text-xl font-semibold text-gray-900">Recommendation History</h2>
               </div>
-              <HistoryTable history={history} onUseRecommendation={fetchRecommendation} />
+              <HistoryTable history={history} total={historyTotal} onUseRecommendation={fetchRecommendation} />
+              {historyNextOffset !== null && (
+                <button
+                  onClick={() => fetchHistory(historyNextOffset)}
+                  className="mt-4 w-full border border-slate-200 text-gray-700 px-4 py-2 rounded-lg hover:bg-slate-50 transition-colors text-sm"
+                >
+                  Load older recommendations ({historyTotal - history.length} more)
+                </button>
+              )}
             </div>
           </div>
         )}